@@ -1,6 +1,10 @@
 __all__ = ["run"]
 
-from .app import run  # noqa: E402
-
 
+def __getattr__(name: str):
+    # auto_bot.app импортируется при первом обращении к run: импорт пакета (например, auto_bot.mock_cms) его не тянет
+    if name == "run":
+        from .app import run
 
+        return run
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
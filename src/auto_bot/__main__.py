@@ -0,0 +1,138 @@
+"""Headless‑запуск без GUI: python -m auto_bot --profile "Аккаунт 1" --workers 2
+
+Логи печатаются в stderr, в stdout — итоговая JSON‑сводка по каждому профилю.
+--startup-profile печатает разбивку холодного старта по фазам (импорты и инициализация) и выходит.
+Код выхода: 0 — все профили отработали, 1 — хотя бы один завершился ошибкой, 2 — неверные аргументы.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from . import app
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m auto_bot", description="Auto Bot без GUI (headless Chromium)")
+    parser.add_argument("--profile", help="имя профиля из var/profiles.json (по умолчанию — первый)")
+    parser.add_argument("--all-profiles", action="store_true", help="запустить все профили со ссылкой одновременно")
+    parser.add_argument("--url", help="ссылка на папку трансляций (переопределяет ссылку профиля)")
+    parser.add_argument("--username", help="логин (переопределяет профиль и SP_USERNAME)")
+    parser.add_argument("--password", help="пароль (переопределяет профиль и SP_PASSWORD)")
+    parser.add_argument("--speed", type=float, default=app.SPEED_DEFAULT, help="множитель скорости (0.2–3.0)")
+    parser.add_argument("--auto-speed", action="store_true", help="подбирать скорость и число воркеров автоматически (AIMD)")
+    parser.add_argument("--workers", type=int, default=app.WORKERS_DEFAULT, help="число параллельных вкладок")
+    parser.add_argument("--passes", type=int, default=1, help="сколько проходов по списку сделать (0 — бесконечно)")
+    parser.add_argument("--max-wait", type=int, default=120, help="сколько секунд ждать появления карточек (0 — без лимита)")
+    parser.add_argument("--headful", action="store_true", help="показывать окно браузера (для отладки)")
+    parser.add_argument("--startup-profile", action="store_true", help="замерить холодный старт по фазам и выйти")
+    return parser.parse_args(argv)
+
+
+def startup_profile() -> dict:
+    """Догружает всё, что окно и запуск загружают лениво, и отмечает каждую фазу."""
+    app.load_profiles()
+    app.startup_mark("profiles")
+    app.load_ui_state()
+    app.startup_mark("ui state")
+    app.load_playwright()
+    app.startup_mark("playwright")
+    try:
+        import customtkinter  # type: ignore  # noqa: F401
+    except Exception:
+        pass
+    app.startup_mark("customtkinter")
+    frames = app._decode_pikachu_frames()
+    app.startup_mark("pikachu gif")
+    report = app.startup_report()
+    report["pikachu_frames"] = len(frames)
+    report["playwright"] = app.async_playwright is not None
+    return report
+
+
+def select_profiles(args: argparse.Namespace) -> list[dict]:
+    profiles = app.load_profiles()
+    if args.all_profiles:
+        selected = [dict(p) for p in profiles if p.get("url")]
+    elif args.profile:
+        selected = [dict(p) for p in profiles if p["name"] == args.profile]
+        if not selected:
+            print(f"Профиль не найден: {args.profile}", file=sys.stderr)
+            raise SystemExit(2)
+    else:
+        selected = [dict(profiles[0])] if profiles else [app.current_profile_from_env()]
+    for prof in selected:
+        if args.url:
+            prof["url"] = args.url
+        if args.username is not None:
+            prof["username"] = args.username
+        if args.password is not None:
+            prof["password"] = args.password
+        prof["url"] = prof.get("url") or app.START_URL
+    return selected
+
+
+def build_summary(profiles: list[dict], started: float) -> dict:
+    duration = time.time() - started
+    rows = []
+    for prof in profiles:
+        stats = app.PROFILE_STATS.get(prof["name"], {})
+        rows.append({
+            "profile": prof["name"],
+            "status": stats.get("status", "Не запущен"),
+            "processed": stats.get("processed", 0),
+            "errors": stats.get("errors", 0),
+            "rate_per_hour": app.stats_rate_per_hour(stats) if stats else 0,
+            "blocked_requests": stats.get("blocked", 0),
+            "blocked_bytes_est": stats.get("blocked_bytes_est", 0),
+            "open_paths": app.open_path_summary(prof["name"]),
+            "phases_ms": {
+                phase: {**{k: round(v, 1) for k, v in app.phase_percentiles(h).items()}, "count": h["count"]}
+                for phase, h in app.PHASE_METRICS.get(prof["name"], {}).items()
+            },
+        })
+    return {
+        # Прогон, в котором ни одна карточка не сохранилась, а ошибки были, успешным не считается
+        "ok": all(row["status"] == "Завершён" and not (row["processed"] == 0 and row["errors"] > 0) for row in rows),
+        "duration_s": round(duration, 1),
+        "processed": sum(row["processed"] for row in rows),
+        "errors": sum(row["errors"] for row in rows),
+        "profiles": rows,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.startup_profile:
+        print(json.dumps(startup_profile(), ensure_ascii=False))
+        return 0
+    if args.workers < 1 or not (0.2 <= args.speed <= 3.0) or args.passes < 0:
+        print("Неверные значения --workers/--speed/--passes", file=sys.stderr)
+        return 2
+    app.LOG_STREAM["stream"] = sys.stderr
+    app.SPEED_STATE["value"] = args.speed
+    app.WORKERS_STATE["value"] = min(args.workers, app.WORKERS_MAX)
+    app.MAX_PASSES_STATE["value"] = args.passes
+    app.PACE_STATE["enabled"] = args.auto_speed or app.PACE_STATE["enabled"]
+    app.pace_reset(app.WORKERS_STATE["value"])
+    app.MAX_WAIT_SECONDS = max(0, args.max_wait)
+    profiles = select_profiles(args)
+    headless = not args.headful
+
+    started = time.time()
+    try:
+        if len(profiles) > 1:
+            asyncio.run(app.main_fleet(profiles, headless=headless))
+        else:
+            app.ACTIVE_PROFILE_NAME["name"] = profiles[0]["name"]
+            asyncio.run(app.main(profiles[0], headless=headless))
+    except KeyboardInterrupt:
+        pass
+    summary = build_summary(profiles, started)
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0 if summary["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
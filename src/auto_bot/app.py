@@ -1,33 +1,78 @@
+import time
 import asyncio
+import atexit
+import base64
+import contextvars
+import hashlib
+import io
 import os
-import time
 import json
 import re
-from urllib.parse import urlsplit, urlunsplit
-from threading import Thread
+import sqlite3
+import sys
+from collections import deque
+from urllib.parse import urlsplit
+import threading
+from threading import Lock, Thread
 from queue import Queue, Empty
 
-# Ленивая поддержка Playwright: не падаем, если пакет не установлен (например, на Python 3.13)
-try:  # noqa: SIM105
-    from playwright.async_api import async_playwright, TimeoutError as PWTimeout
-except Exception:  # ModuleNotFoundError и прочее
-    async_playwright = None  # type: ignore[assignment]
+# Отметки холодного старта: фаза -> длительность от предыдущей отметки (см. python -m auto_bot --startup-profile).
+# Отсчёт — сразу после импортов stdlib, до dotenv и настроек
+STARTUP: dict = {"t0": time.perf_counter(), "last": time.perf_counter(), "phases": []}
+
+def startup_mark(phase: str) -> None:
+    now = time.perf_counter()
+    STARTUP["phases"].append((phase, (now - STARTUP["last"]) * 1000))
+    STARTUP["last"] = now
+
+def startup_report() -> dict:
+    return {
+        "phases": [{"phase": phase, "ms": round(ms, 1)} for phase, ms in STARTUP["phases"]],
+        "total_ms": round(sum(ms for _phase, ms in STARTUP["phases"]), 1),
+    }
+
+def log_startup_report() -> None:
+    """Окно готово к работе: при STARTUP_PROFILE=1 печатает разбивку холодного старта."""
+    startup_mark("first idle")
+    if os.getenv("STARTUP_PROFILE", "0") == "1":
+        report = startup_report()
+        phases = ", ".join(f"{row['phase']} {row['ms']:.0f} мс" for row in report["phases"])
+        log(f"Старт окна: {report['total_ms']:.0f} мс ({phases})")
+
+# Playwright импортируется при первом запуске бота (load_playwright), а не при импорте модуля:
+# окно и headless‑CLI стартуют без него. До загрузки PWTimeout — заглушка, которую никто не бросает
+async_playwright = None
+
+class _DummyTimeoutError(Exception):
+    pass
 
-    class _DummyTimeoutError(Exception):
-        pass
+PWTimeout = _DummyTimeoutError  # type: ignore[assignment]
+
+def load_playwright() -> bool:
+    """Импортирует Playwright при первом вызове; False — пакет не установлен (например, на Python 3.13)."""
+    global async_playwright, PWTimeout
+    if async_playwright is not None:
+        return True
+    try:
+        from playwright.async_api import async_playwright as _async_playwright, TimeoutError as _PWTimeout
+    except Exception:  # ModuleNotFoundError и прочее
+        return False
+    PWTimeout = _PWTimeout  # type: ignore[assignment]
+    async_playwright = _async_playwright  # type: ignore[assignment]
+    return True
 
-    PWTimeout = _DummyTimeoutError  # type: ignore[assignment]
+# Куда печатать логи (CLI переключает на stderr, чтобы stdout оставался машиночитаемым)
+LOG_STREAM: dict = {"stream": None}
 
-# Необязательная поддержка анимированного GIF (Pikachu)
-try:  # noqa: SIM105
-    from PIL import Image, ImageTk  # type: ignore
-except Exception:
-    Image = None  # type: ignore
-    ImageTk = None  # type: ignore
+# Имя профиля текущей задачи (для префикса логов при одновременном запуске нескольких профилей)
+CURRENT_PROFILE: contextvars.ContextVar[str] = contextvars.ContextVar("CURRENT_PROFILE", default="")
 
 # Простой логгер
 def log(message: str) -> None:
-    print(f"[bot] {message}", flush=True)
+    profile_name = CURRENT_PROFILE.get()
+    if profile_name:
+        message = f"[{profile_name}] {message}"
+    print(f"[bot] {message}", file=LOG_STREAM["stream"] or sys.stdout, flush=True)
     # Отдельный, более дружелюбный к пользователю текст — для окна статуса
     try:
         friendly = make_user_friendly_log(message)
@@ -38,13 +83,31 @@ def log(message: str) -> None:
     except Exception:
         pass
 
-# Поддержка .env (необязательно). Если нет библиотеки, просто игнорируем
-try:
-    from dotenv import load_dotenv  # type: ignore
+def find_dotenv_path() -> str | None:
+    """Ищет .env от текущего каталога и от каталога пакета вверх (как python-dotenv)."""
+    for start in (os.getcwd(), os.path.dirname(os.path.abspath(__file__))):
+        current = start
+        while True:
+            candidate = os.path.join(current, ".env")
+            if os.path.isfile(candidate):
+                return candidate
+            parent = os.path.dirname(current)
+            if parent == current:
+                break
+            current = parent
+    return None
 
-    load_dotenv()
-except Exception:
-    pass
+# Поддержка .env (необязательно): python-dotenv импортируется, только если файл .env есть.
+# Если нет библиотеки, просто игнорируем
+_DOTENV_PATH = find_dotenv_path()
+if _DOTENV_PATH:
+    try:
+        from dotenv import load_dotenv  # type: ignore
+
+        load_dotenv(_DOTENV_PATH)
+    except Exception:
+        pass
+startup_mark("dotenv")
 
 # === Настройки ===
 START_URL = "https://cms.smartplayer.org/#/broadcasts?folderId=602"  # <-- подставь свою ссылку
@@ -89,11 +152,13 @@ CONFIRM_YES = 'button:has-text("Да"), .fpmmcgp:has-text("Да"), text=Да'
 CLICK_TIMEOUT = 15000
 SCROLL_STEP = 1400
 OPEN_WAIT_MS = 300
+# Общий лимит на обнаружение открытой карточки (все признаки ждём одновременно, масштабируется SPEED).
+# Ожидание выходит по первому признаку, так что длинный бюджет не замедляет успешное открытие
+OPEN_DETECT_MS = 18000
 AFTER_SAVE_WAIT_MS = 200
 HOLD_OPEN_SECONDS = int(os.getenv("HOLD_OPEN_SECONDS", "0"))
 # Ожидание появления карточек пользователем (навигация вручную)
 WAIT_UNTIL_CARDS = os.getenv("WAIT_UNTIL_CARDS", "1") != "0"  # 1 — ждать, 0 — не ждать
-POLL_INTERVAL_MS = int(os.getenv("POLL_INTERVAL_MS", "1500"))
 MAX_WAIT_SECONDS = int(os.getenv("MAX_WAIT_SECONDS", "0"))  # 0 — без лимита
 
 # Визуальная подсветка кликов
@@ -107,6 +172,9 @@ GRID_SCROLL_SELECTOR = os.getenv("GRID_SCROLL_SELECTOR", "")
 PROFILES_PATH = os.getenv("PROFILES_PATH", "var/profiles.json")
 PROFILES_STATE: dict[str, list[dict[str, str]]] = {"profiles": []}
 UI_STATE_PATH = os.getenv("UI_STATE_PATH", "var/ui.json")
+UI_PUMP_MS = 100  # как часто окно забирает изменения шины состояния и строки лога
+UI_PUMP_HIDDEN_MS = 1000  # то же, пока окно свёрнуто или не в фокусе
+LOG_VIEW_MAX_LINES = 500  # сколько строк лога держит окно
 
 def get_default_profiles() -> list[dict[str, str]]:
     return [
@@ -136,6 +204,8 @@ def load_profiles() -> list[dict[str, str]]:
                         "url": str(p.get("url", "")),
                         "username": str(p.get("username", "")),
                         "password": str(p.get("password", "")),
+                        # Подстроки URL, которые не блокируются для этого профиля (через запятую)
+                        "allow": str(p.get("allow", "")),
                     }
                 )
             if result:
@@ -144,16 +214,74 @@ def load_profiles() -> list[dict[str, str]]:
         pass
     return get_default_profiles()
 
+def write_text_atomic(path: str, text: str) -> None:
+    """Пишет текст во временный файл и подменяет им исходный — файл никогда не остаётся наполовину записанным."""
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def write_json_atomic(path: str, data) -> None:
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+# Правки полей профиля копятся PROFILES_SAVE_DEBOUNCE_S и записываются одним разом в фоновом потоке
+PROFILES_SAVE_DEBOUNCE_S = 0.8
+_PROFILES_WRITER: dict = {"timer": None, "snapshot": None, "seq": 0, "written": 0}
+_PROFILES_WRITER_LOCK = Lock()
+
+def _write_profiles_snapshot(seq: int, snapshot: list[dict[str, str]]) -> None:
+    with _PROFILES_WRITER_LOCK:
+        # Более новая правка уже записана — старый снимок не должен её затереть
+        if seq < _PROFILES_WRITER["written"]:
+            return
+        try:
+            write_json_atomic(PROFILES_PATH, snapshot)
+            _PROFILES_WRITER["written"] = seq
+        except Exception:
+            pass
+
 def save_profiles(profiles: list[dict[str, str]]) -> None:
-    try:
-        profile_dir = os.path.dirname(PROFILES_PATH)
-        if profile_dir:
-            os.makedirs(profile_dir, exist_ok=True)
-        with open(PROFILES_PATH, "w", encoding="utf-8") as f:
-            json.dump(profiles, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
     PROFILES_STATE["profiles"] = profiles
+    schedule_profiles_save(delay=0)
+
+def update_profile_fields(name: str, url: str, username: str, password: str) -> bool:
+    """Переносит поля формы в профиль; заполненный профиль не затирается полностью пустой формой."""
+    prof = next((p for p in PROFILES_STATE["profiles"] if p["name"] == name), None)
+    if prof is None:
+        return False
+    values = {"url": url.strip(), "username": username.strip(), "password": password.strip()}
+    if not any(values.values()) and any(prof.get(k) for k in values):
+        return False
+    if all(prof.get(k, "") == v for k, v in values.items()):
+        return False
+    prof.update(values)
+    return True
+
+def schedule_profiles_save(delay: float = PROFILES_SAVE_DEBOUNCE_S) -> None:
+    """Отложенная атомарная запись var/profiles.json вне потока окна: серия правок — одна запись."""
+    snapshot = [dict(p) for p in PROFILES_STATE["profiles"]]
+    with _PROFILES_WRITER_LOCK:
+        if _PROFILES_WRITER["timer"] is not None:
+            _PROFILES_WRITER["timer"].cancel()
+        _PROFILES_WRITER["seq"] += 1
+        timer = threading.Timer(delay, _write_profiles_snapshot, args=(_PROFILES_WRITER["seq"], snapshot))
+        timer.daemon = True
+        _PROFILES_WRITER.update({"timer": timer, "snapshot": snapshot})
+        timer.start()
+
+def flush_profiles_save() -> None:
+    """Записывает отложенные правки сразу (при закрытии окна)."""
+    with _PROFILES_WRITER_LOCK:
+        timer, snapshot, seq = _PROFILES_WRITER["timer"], _PROFILES_WRITER["snapshot"], _PROFILES_WRITER["seq"]
+        if timer is not None:
+            timer.cancel()
+        _PROFILES_WRITER["timer"] = None
+        pending = snapshot is not None and seq > _PROFILES_WRITER["written"]
+    if pending:
+        _write_profiles_snapshot(seq, snapshot)
 
 def load_ui_state() -> dict:
     try:
@@ -167,19 +295,16 @@ def load_ui_state() -> dict:
 
 def save_ui_state(state: dict) -> None:
     try:
-        d = os.path.dirname(UI_STATE_PATH)
-        if d:
-            os.makedirs(d, exist_ok=True)
-        with open(UI_STATE_PATH, "w", encoding="utf-8") as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
+        write_json_atomic(UI_STATE_PATH, state)
     except Exception:
         pass
 
-async def highlight_locator(page, locator):
+async def highlight_locator(page, locator, box: dict | None = None):
+    """Подсвечивает элемент; box — уже известные координаты (без лишнего запроса bounding_box)."""
     if not SHOW_CLICKS:
         return
     try:
-        box = await locator.bounding_box()
+        box = box or await locator.bounding_box()
         if not box:
             return
         await page.evaluate(
@@ -194,11 +319,55 @@ async def highlight_locator(page, locator):
 # ====== Скорость выполнения (слайдер UI) ======
 SPEED_DEFAULT = float(os.getenv("SPEED", "1.0"))  # 1.0 — базовая скорость
 SPEED_STATE = {"value": SPEED_DEFAULT}
+# Количество параллельных вкладок-воркеров (1 — обычный последовательный режим)
+WORKERS_DEFAULT = max(1, int(os.getenv("WORKERS", "1")))
+WORKERS_STATE = {"value": WORKERS_DEFAULT}
+WORKERS_MAX = 8
+# Сколько раз воркер подскролливает сетку в поисках карточки по id
+WORKER_FIND_SCROLLS = 12
+# Сколько раз карточка, которую воркер не нашёл или не сохранил, возвращается в очередь за проход
+WORKER_RETRIES = max(0, int(os.getenv("WORKER_RETRIES", "2")))
+# Сколько полных проходов по списку сделать (0 — бесконечно, как в GUI)
+MAX_PASSES_STATE = {"value": max(0, int(os.getenv("MAX_PASSES", "0")))}
 STOP_FLAG = {"stop": False}
 BOT_STATE = {"running": False}
 ACTIVE_PROFILE_NAME = {"name": "Аккаунт 1"}
-RATE_PER_HOUR_AT_1X = int(os.getenv("RATE_PER_HOUR_AT_1X", "120"))  # базовая оценка карточек/час на скорости 1x
-LOG_QUEUE: Queue = Queue(maxsize=200)
+LOG_QUEUE: Queue = Queue(maxsize=1000)
+# Статус и счётчики по каждому запущенному профилю: имя -> {name, status, processed, errors, started}
+PROFILE_STATS: dict[str, dict] = {}
+# Шина состояния бот → окно: последнее значение каждой темы и темы, изменившиеся с прошлого забора.
+# Окно забирает пачку изменений и обновляет только затронутые виджеты; без окна шина не растёт
+STATE_BUS: dict = {"last": {}, "dirty": set()}
+_BUS_LOCK = Lock()
+
+def publish(topic: str, value) -> None:
+    """Публикует новое значение темы ("running", "paused", "pace", "stats:<профиль>"); повтор не отправляется."""
+    with _BUS_LOCK:
+        last = STATE_BUS["last"]
+        if topic in last and last[topic] == value:
+            return
+        last[topic] = value
+        STATE_BUS["dirty"].add(topic)
+
+def drain_bus() -> dict:
+    """Изменения с прошлого вызова: тема -> последнее значение."""
+    with _BUS_LOCK:
+        changes = {topic: STATE_BUS["last"][topic] for topic in STATE_BUS["dirty"]}
+        STATE_BUS["dirty"].clear()
+    return changes
+
+def drain_log_lines(limit: int = 200) -> list[str]:
+    lines: list[str] = []
+    try:
+        while len(lines) < limit:
+            lines.append(LOG_QUEUE.get_nowait())
+    except Empty:
+        pass
+    return lines
+
+def set_running(running: bool) -> None:
+    BOT_STATE["running"] = running
+    publish("running", running)
 LAST_UI_LOG: dict[str, str] = {"msg": ""}
 
 def make_user_friendly_log(raw: str) -> str:
@@ -236,17 +405,58 @@ def make_user_friendly_log(raw: str) -> str:
 # ===== Pikachu animation helpers =====
 _PIKACHU_FRAMES: list | None = None
 _PIKACHU_FRAME_MS: int = 90
-_PIKACHU_AFTER: dict = {"id": None, "label": None}
+_PIKACHU_AFTER: dict = {"id": None, "label": None, "idx": 0}
 _PIKACHU_ANIMATING: dict[str, bool] = {"on": False}
+# Фоновая загрузка кадров: поток, декодированные PIL‑кадры и кого уведомить, когда PhotoImage готовы
+_PIKACHU_LOAD: dict = {"thread": None, "decoded": None, "callbacks": []}
+# Окно видно и в фокусе: иначе анимация не тикает, а шина опрашивается реже
+PANEL_VIEW: dict[str, bool] = {"visible": True}
+# Увеличенные кадры хранятся на диске полосой PNG; ключ — хэш GIF, масштаб и длительность кадра
+PIKACHU_CACHE_DIR = os.getenv("PIKACHU_CACHE_DIR", "var/cache")
+
+def _read_pikachu_atlas(path: str) -> list:
+    from PIL import Image  # type: ignore
+    try:
+        atlas = Image.open(path)
+        atlas.load()
+        count = int(atlas.text.get("frames", "0"))
+    except Exception:
+        return []
+    if count <= 0 or atlas.width % count:
+        return []
+    width = atlas.width // count
+    return [atlas.crop((i * width, 0, (i + 1) * width, atlas.height)) for i in range(count)]
+
+def _write_pikachu_atlas(path: str, frames: list) -> None:
+    from PIL import Image, PngImagePlugin  # type: ignore
+    try:
+        width, height = frames[0].size
+        atlas = Image.new("RGBA", (width * len(frames), height))
+        for i, frame in enumerate(frames):
+            atlas.paste(frame, (i * width, 0))
+        info = PngImagePlugin.PngInfo()
+        info.add_text("frames", str(len(frames)))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        atlas.save(tmp_path, format="PNG", pnginfo=info)
+        os.replace(tmp_path, path)
+    except Exception:
+        pass
 
-def _load_pikachu_frames() -> list:
-    if Image is None or ImageTk is None:
+def _decode_pikachu_frames() -> list:
+    """Кадры GIF (PIL.Image, уже увеличенные) из кэша на диске или из самого GIF; пустой список — нет PIL или файла."""
+    # PIL нужен только для анимации в GUI — импортируем по месту, чтобы headless‑режим его не тянул
+    try:
+        from PIL import Image  # type: ignore
+    except Exception:
         return []
     try:
         gif_path = os.getenv("PIKACHU_GIF", os.path.join(os.path.dirname(__file__), "pikachu.gif"))
         if not os.path.exists(gif_path):
             return []
-        img = Image.open(gif_path)
+        with open(gif_path, "rb") as f:
+            data = f.read()
+        img = Image.open(io.BytesIO(data))
         # Determine frame delay and scaling
         base_ms = int(img.info.get("duration", 100))
         try:
@@ -263,45 +473,90 @@ def _load_pikachu_frames() -> list:
             scale = max(1.0, min(5.0, float(os.getenv("PIKACHU_SCALE", "2.5"))))
         except Exception:
             scale = 2.5
-        frames: list = []
+        digest = hashlib.sha1(data).hexdigest()[:16]
+        atlas_path = os.path.join(PIKACHU_CACHE_DIR, f"pikachu-{digest}-x{scale:g}-{_PIKACHU_FRAME_MS}ms.png")
+        frames = _read_pikachu_atlas(atlas_path) if os.path.exists(atlas_path) else []
+        if frames:
+            return frames
         try:
             while True:
                 frame = img.copy().convert("RGBA")
                 new_size = (int(frame.width * scale), int(frame.height * scale))
-                frame = frame.resize(new_size, Image.NEAREST)
-                frames.append(ImageTk.PhotoImage(frame))
+                frames.append(frame.resize(new_size, Image.NEAREST))
                 img.seek(img.tell() + 1)
         except Exception:
             pass
+        if frames:
+            _write_pikachu_atlas(atlas_path, frames)
         return frames
     except Exception:
         return []
 
-def start_pikachu_animation(target_label) -> None:
-    global _PIKACHU_FRAMES
-    if _PIKACHU_FRAMES is None:
-        _PIKACHU_FRAMES = _load_pikachu_frames()
-    if not _PIKACHU_FRAMES:
+def load_pikachu_frames_async(widget, on_ready=None) -> None:
+    """Декодирует кадры в фоновом потоке; PhotoImage создаются в потоке окна, затем вызывается on_ready."""
+    if _PIKACHU_FRAMES is not None:
+        if on_ready:
+            on_ready()
+        return
+    if on_ready:
+        _PIKACHU_LOAD["callbacks"].append(on_ready)
+    if _PIKACHU_LOAD["thread"] is not None:
+        return
+
+    def decode() -> None:
+        _PIKACHU_LOAD["decoded"] = _decode_pikachu_frames()
+
+    def finish() -> None:
+        global _PIKACHU_FRAMES
+        if _PIKACHU_LOAD["thread"].is_alive():
+            widget.after(30, finish)
+            return
+        photos: list = []
+        if _PIKACHU_LOAD["decoded"]:
+            try:
+                from PIL import ImageTk  # type: ignore
+                photos = [ImageTk.PhotoImage(frame) for frame in _PIKACHU_LOAD["decoded"]]
+            except Exception:
+                photos = []
+        _PIKACHU_FRAMES = photos
+        _PIKACHU_LOAD["decoded"] = None
+        startup_mark("pikachu frames")
+        callbacks, _PIKACHU_LOAD["callbacks"] = _PIKACHU_LOAD["callbacks"], []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    _PIKACHU_LOAD["thread"] = Thread(target=decode, daemon=True)
+    _PIKACHU_LOAD["thread"].start()
+    widget.after(30, finish)
+
+def _pikachu_tick() -> None:
+    _PIKACHU_AFTER["id"] = None
+    label = _PIKACHU_AFTER["label"]
+    # Свёрнутое или неактивное окно: следующий тик не планируем, set_panel_visible возобновит
+    if not _PIKACHU_ANIMATING["on"] or label is None or not _PIKACHU_FRAMES or not PANEL_VIEW["visible"]:
         return
+    try:
+        frame = _PIKACHU_FRAMES[_PIKACHU_AFTER["idx"] % len(_PIKACHU_FRAMES)]
+        label.configure(image=frame)
+        label.image = frame  # keep ref
+        _PIKACHU_AFTER["idx"] += 1
+        _PIKACHU_AFTER["id"] = label.after(_PIKACHU_FRAME_MS, _pikachu_tick)
+    except Exception:
+        pass
+
+def start_pikachu_animation(target_label) -> None:
     # Если уже анимируем на том же label — ничего не делаем, чтобы не перезапускать на кадр 0
     if _PIKACHU_ANIMATING.get("on") and _PIKACHU_AFTER.get("label") is target_label:
         return
     # Иначе, останавливаем прошлую анимацию (если была) и запускаем новую
     stop_pikachu_animation()
     _PIKACHU_ANIMATING["on"] = True
-    _PIKACHU_AFTER["label"] = target_label
-
-    def _loop(idx: int = 0) -> None:
-        if not _PIKACHU_ANIMATING["on"]:
-            return
-        try:
-            target_label.configure(image=_PIKACHU_FRAMES[idx % len(_PIKACHU_FRAMES)])
-            target_label.image = _PIKACHU_FRAMES[idx % len(_PIKACHU_FRAMES)]  # keep ref
-            _PIKACHU_AFTER["id"] = target_label.after(_PIKACHU_FRAME_MS, lambda: _loop(idx + 1))
-        except Exception:
-            pass
-
-    _loop(0)
+    _PIKACHU_AFTER.update({"label": target_label, "idx": 0})
+    # Кадры ещё грузятся — анимация начнётся, когда они будут готовы
+    load_pikachu_frames_async(target_label, lambda: _pikachu_tick() if _PIKACHU_AFTER["id"] is None else None)
 
 def stop_pikachu_animation() -> None:
     try:
@@ -313,6 +568,14 @@ def stop_pikachu_animation() -> None:
     _PIKACHU_AFTER["label"] = None
     _PIKACHU_ANIMATING["on"] = False
 
+def set_panel_visible(visible: bool) -> None:
+    """Окно свернули/скрыли или оно потеряло фокус — анимация замирает; вернулось — продолжается с того же кадра."""
+    if PANEL_VIEW["visible"] == visible:
+        return
+    PANEL_VIEW["visible"] = visible
+    if visible and _PIKACHU_ANIMATING["on"] and _PIKACHU_AFTER["id"] is None:
+        _pikachu_tick()
+
 def TO(ms: int) -> int:
     # Таймауты: уменьшаем при увеличении скорости, но не ниже 500 мс
     factor = SPEED_STATE["value"] if SPEED_STATE["value"] > 0 else 1.0
@@ -323,16 +586,114 @@ def AD(ms: int) -> int:
     factor = SPEED_STATE["value"] if SPEED_STATE["value"] > 0 else 1.0
     return max(50, int(ms / factor))
 
-def estimate_rate_per_hour() -> int:
+def profile_stats(name: str) -> dict:
+    """Счётчики профиля (создаются при первом обращении)."""
+    stats = PROFILE_STATS.get(name)
+    if stats is None:
+        stats = {"name": name, "status": "Ожидает запуска", "processed": 0, "errors": 0, "started": time.time()}
+        PROFILE_STATS[name] = stats
+    return stats
+
+def publish_stats(stats: dict) -> None:
+    publish(f"stats:{stats.get('name', '')}", {**stats, "blocked_by_type": dict(stats.get("blocked_by_type", {}))})
+
+def set_status(stats: dict, status: str) -> None:
+    stats["status"] = status
+    publish_stats(stats)
+
+def count_card(stats: dict, ok: bool, count: int = 1) -> None:
+    """Учитывает обработанную (ok) или ошибочную карточку и сообщает окну."""
+    stats["processed" if ok else "errors"] += count
+    publish_stats(stats)
+
+def reset_profile_stats(name: str) -> dict:
+    """Обнуляет счётчики профиля перед новым запуском (тот же dict — на него ссылаются маршруты контекста)."""
+    stats = profile_stats(name)
+    stats.update({
+        "status": "Запуск", "processed": 0, "errors": 0, "started": time.time(),
+        "blocked": 0, "blocked_bytes_est": 0, "blocked_by_type": {},
+    })
+    # Прямые пути открытия получают новый шанс в каждом запуске
+    OPEN_PATH_STATS.pop(name, None)
+    publish_stats(stats)
+    return stats
+
+def stats_rate_per_hour(stats: dict) -> int:
+    elapsed = max(1.0, time.time() - stats.get("started", time.time()))
+    return int(stats.get("processed", 0) * 3600 / elapsed)
+
+# Канал паузы между потоком окна и циклом бота: STOP_FLAG — состояние для UI,
+# события в цикле бота будят ожидающие задачи сразу, без опроса браузера
+PAUSE_CHANNEL: dict = {"loop": None, "resume": None, "pause": None}
+
+def _pause_events() -> tuple[asyncio.Event, asyncio.Event]:
+    """События текущего цикла: resume установлен, пока бот работает, pause — пока стоит пауза."""
+    loop = asyncio.get_running_loop()
+    if PAUSE_CHANNEL["loop"] is not loop:
+        resume, pause = asyncio.Event(), asyncio.Event()
+        (pause if STOP_FLAG["stop"] else resume).set()
+        PAUSE_CHANNEL.update({"loop": loop, "resume": resume, "pause": pause})
+    return PAUSE_CHANNEL["resume"], PAUSE_CHANNEL["pause"]
+
+def set_paused(paused: bool) -> None:
+    """Пауза/продолжение из любого потока; ожидающие задачи цикла бота просыпаются сразу."""
+    STOP_FLAG["stop"] = paused
+    publish("paused", paused)
+    loop = PAUSE_CHANNEL["loop"]
+    if loop is None or loop.is_closed():
+        return
+
+    def apply() -> None:
+        resume, pause = PAUSE_CHANNEL["resume"], PAUSE_CHANNEL["pause"]
+        if STOP_FLAG["stop"]:
+            resume.clear()
+            pause.set()
+        else:
+            pause.clear()
+            resume.set()
+
     try:
-        base = RATE_PER_HOUR_AT_1X if RATE_PER_HOUR_AT_1X > 0 else 1
-        speed = SPEED_STATE["value"] if SPEED_STATE["value"] > 0 else 1.0
-        return max(1, int(round(base * speed)))
-    except Exception:
-        return max(1, RATE_PER_HOUR_AT_1X)
+        loop.call_soon_threadsafe(apply)
+    except RuntimeError:
+        pass
 
 def request_stop() -> None:
-    STOP_FLAG["stop"] = True
+    set_paused(True)
+
+async def wait_if_paused() -> None:
+    """Возвращается сразу, если паузы нет; иначе ждёт «Продолжить» без опроса."""
+    resume, _pause = _pause_events()
+    if not resume.is_set():
+        await resume.wait()
+
+async def run_pausable(factory, on_interrupt=None):
+    """Выполняет шаг factory(); пауза во время шага прерывает его, после «Продолжить» шаг запускается заново.
+
+    on_interrupt — async‑функция, возвращающая страницу в исходное состояние перед повтором.
+    """
+    while True:
+        await wait_if_paused()
+        _resume, pause = _pause_events()
+        step = asyncio.ensure_future(factory())
+        paused = asyncio.ensure_future(pause.wait())
+        try:
+            await asyncio.wait({step, paused}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            paused.cancel()
+            if not step.done():
+                step.cancel()
+                try:
+                    await step
+                except BaseException:
+                    pass
+        if not step.cancelled():
+            return step.result()
+        log("Пауза: текущий шаг прерван, повторю его после продолжения")
+        if on_interrupt is not None:
+            try:
+                await on_interrupt()
+            except Exception:
+                pass
 
 def run_speed_slider_ui_main_thread(start_bot_callable) -> None:
     """Запускает Tkinter-слайдер в главном потоке, а бота — в отдельном."""
@@ -411,36 +772,55 @@ def run_speed_slider_ui_main_thread(start_bot_callable) -> None:
             scale.pack(padx=10, pady=8)
             root.mainloop()
 
-async def wait_card_open(page) -> bool:
-    """Проверяем, что карточка открылась по любому из признаков."""
-    candidates = [*SAVE_CANDIDATES, CLOSE_BTN]
-    for css in candidates:
-        try:
-            await page.locator(css).first.wait_for(timeout=2000)
-            return True
-        except Exception:
-            continue
-    return False
+def open_signals_locator(page):
+    """Один локатор на все видимые признаки открытой карточки (кнопки сохранения и закрытия).
 
-async def try_click_sequence(page, loc) -> bool:
-    """Пробуем разные варианты клика по элементу. Возвращает True если карточка открылась."""
-    await highlight_locator(page, loc)
+    Скрытые совпадения отсекаются ещё в селекторе: иначе .first указывал бы на невидимую «Назад» где‑нибудь
+    на странице, и ожидание тянулось бы весь таймаут при уже открытой карточке.
+    """
+    combined = None
+    for css in [*SAVE_CANDIDATES, CLOSE_BTN]:
+        candidate = page.locator(f"{css} >> visible=true")
+        combined = candidate if combined is None else combined.or_(candidate)
+    return combined.first
+
+async def wait_card_open(page, timeout: int = OPEN_DETECT_MS) -> bool:
+    """Проверяем, что карточка открылась: ждём все признаки сразу и выходим по первому появившемуся."""
     try:
-        await loc.scroll_into_view_if_needed()
+        await open_signals_locator(page).wait_for(timeout=TO(timeout))
+        return True
     except Exception:
-        pass
+        return False
 
-    # Набор стратегий клика
-    strategies = [
-        ("locator.dblclick", lambda: loc.dblclick(timeout=CLICK_TIMEOUT)),
-        ("locator.dblclick(force)", lambda: loc.dblclick(timeout=CLICK_TIMEOUT, force=True)),
-        ("locator.click x2", lambda: loc.click(timeout=CLICK_TIMEOUT, click_count=2)),
-        ("coordinate dblclick center", None),
-        ("coordinate dblclick offset1", None),
-        ("coordinate dblclick offset2", None),
-    ]
+async def try_click_sequence(page, loc, prepared: dict | None = None) -> bool:
+    """Пробуем разные варианты клика по элементу. Возвращает True если карточка открылась.
 
-    for name, action in strategies:
+    prepared — плитка, подготовленная заранее (prefetch_tiles): координаты известны, прокрутка уже сделана.
+    """
+    setup_started = time.perf_counter()
+    if prepared and prepared.get("in_viewport"):
+        await highlight_locator(page, loc, prepared["box"])
+    else:
+        await highlight_locator(page, loc)
+        try:
+            await loc.scroll_into_view_if_needed()
+        except Exception:
+            pass
+    record_phase("open_setup", setup_started)
+
+    # Набор стратегий клика (порядок — по накопленному рейтингу)
+    strategies = {
+        "locator.dblclick": lambda: loc.dblclick(timeout=CLICK_TIMEOUT),
+        "locator.dblclick(force)": lambda: loc.dblclick(timeout=CLICK_TIMEOUT, force=True),
+        "locator.click x2": lambda: loc.click(timeout=CLICK_TIMEOUT, click_count=2),
+        "coordinate dblclick center": None,
+        "coordinate dblclick offset1": None,
+        "coordinate dblclick offset2": None,
+    }
+
+    for name in rank_candidates("click", list(strategies)):
+        action = strategies[name]
+        started = time.perf_counter()
         try:
             if action is not None:
                 await action()
@@ -460,10 +840,16 @@ async def try_click_sequence(page, loc) -> bool:
                     await page.mouse.click(cx, cy, click_count=2, delay=40)
         except Exception:
             pass
+        record_phase("open_click", started)
 
         # Проверяем, что открылось
-        if await wait_card_open(page):
+        detect_started = time.perf_counter()
+        opened = await wait_card_open(page)
+        record_phase("open_detect", detect_started, opened)
+        if opened:
+            record_outcome("click", name, True, (time.perf_counter() - started) * 1000)
             return True
+        record_outcome("click", name, False, (time.perf_counter() - started) * 1000)
         # Небольшая пауза перед следующей попыткой
         await page.wait_for_timeout(200)
 
@@ -488,9 +874,291 @@ TILE_PREVIEW_SELECTOR = os.getenv(
 # Ожидание авторизации (первый запуск), 10 минут
 LOGIN_WAIT_TIMEOUT = 10 * 60 * 1000
 
-# Путь к сохранённому состоянию сессии (хранится в var/ по умолчанию)
+# Каталог рабочих файлов берётся из STATE_PATH; сессии профилей — в var/states/<профиль>.json
 STATE_PATH = os.getenv("STATE_PATH", "var/state.json")
 
+# ====== Обучаемый порядок селекторов и стратегий клика ======
+# Статистика хранится рядом с var/state.json и переживает перезапуски
+RANKING_PATH = os.getenv("RANKING_PATH", os.path.join(os.path.dirname(STATE_PATH) or ".", "ranking.json"))
+# Сколько неудач подряд у лидера сбрасывают накопленный рейтинг
+RANKING_FAIL_RESET = int(os.getenv("RANKING_FAIL_RESET", "3"))
+RANKING_SAVE_INTERVAL_S = 10
+# kind ("save", "click", ...) -> ключ (селектор/стратегия) -> {hits, fails, streak, avg_ms}
+RANKING_STATE: dict[str, dict[str, dict]] = {}
+_RANKING_META: dict = {"loaded": False, "dirty": False, "saved_at": 0.0}
+
+def load_ranking() -> dict[str, dict[str, dict]]:
+    if _RANKING_META["loaded"]:
+        return RANKING_STATE
+    _RANKING_META["loaded"] = True
+    try:
+        with open(RANKING_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            for kind, entries in data.items():
+                if isinstance(entries, dict):
+                    RANKING_STATE[kind] = {k: v for k, v in entries.items() if isinstance(v, dict)}
+    except Exception:
+        pass
+    return RANKING_STATE
+
+def save_ranking(force: bool = False) -> None:
+    """Сбрасывает рейтинг на диск не чаще раза в RANKING_SAVE_INTERVAL_S (или сразу при force)."""
+    if not _RANKING_META["dirty"]:
+        return
+    now = time.time()
+    if not force and now - _RANKING_META["saved_at"] < RANKING_SAVE_INTERVAL_S:
+        return
+    try:
+        write_json_atomic(RANKING_PATH, RANKING_STATE)
+        _RANKING_META["dirty"] = False
+        _RANKING_META["saved_at"] = now
+    except Exception:
+        pass
+
+def rank_candidates(kind: str, keys: list[str]) -> list[str]:
+    """Сначала — успешные варианты (больше попаданий, меньше задержка), затем остальные в исходном порядке."""
+    entries = load_ranking().get(kind, {})
+
+    def sort_key(key: str) -> tuple:
+        e = entries.get(key)
+        if not e or not e.get("hits"):
+            return (1, 0, 0.0)
+        return (0, -int(e["hits"]), float(e.get("avg_ms", 0.0)))
+
+    return sorted(keys, key=sort_key)
+
+def record_outcome(kind: str, key: str, ok: bool, elapsed_ms: float) -> None:
+    """Учитывает попытку. Если лидер начал стабильно проигрывать — рейтинг вида сбрасывается."""
+    entries = load_ranking().setdefault(kind, {})
+    e = entries.setdefault(key, {"hits": 0, "fails": 0, "streak": 0, "avg_ms": 0.0})
+    if ok:
+        e["hits"] += 1
+        e["streak"] = 0
+        # Скользящее среднее задержки
+        e["avg_ms"] = round(elapsed_ms if e["hits"] == 1 else e["avg_ms"] * 0.8 + elapsed_ms * 0.2, 1)
+    else:
+        e["fails"] += 1
+        e["streak"] += 1
+        if e["hits"] and e["streak"] >= RANKING_FAIL_RESET:
+            log(f"Рейтинг «{kind}» сброшен: {key} перестал срабатывать")
+            RANKING_STATE[kind] = {}
+    _RANKING_META["dirty"] = True
+    save_ranking()
+
+# ====== Замеры фаз обработки карточки ======
+# События (JSONL) дописываются в var/metrics.jsonl, сводка для Prometheus перезаписывается в var/metrics.prom
+METRICS_EVENTS_PATH = os.getenv("METRICS_EVENTS_PATH", os.path.join(os.path.dirname(STATE_PATH) or ".", "metrics.jsonl"))
+METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH", os.path.join(os.path.dirname(STATE_PATH) or ".", "metrics.prom"))
+METRICS_FLUSH_INTERVAL_S = 10
+# Перцентили считаются по последним N замерам каждой фазы
+METRICS_WINDOW = 2000
+# профиль -> фаза -> {count, sum_ms, fails, samples}
+PHASE_METRICS: dict[str, dict[str, dict]] = {}
+_METRICS_META: dict = {"pending": [], "flushed_at": 0.0}
+
+def record_phase(phase: str, started: float, ok: bool = True) -> float:
+    """Учитывает длительность фазы от started (time.perf_counter()) для текущего профиля; возвращает мс."""
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    profile = current_profile_name()
+    h = PHASE_METRICS.setdefault(profile, {}).setdefault(
+        phase, {"count": 0, "sum_ms": 0.0, "fails": 0, "samples": deque(maxlen=METRICS_WINDOW)}
+    )
+    h["count"] += 1
+    h["sum_ms"] += elapsed_ms
+    h["samples"].append(elapsed_ms)
+    if not ok:
+        h["fails"] += 1
+    _METRICS_META["pending"].append(
+        {"ts": round(time.time(), 3), "profile": profile, "phase": phase, "ms": round(elapsed_ms, 1), "ok": ok}
+    )
+    flush_metrics()
+    return elapsed_ms
+
+def phase_percentiles(h: dict) -> dict[str, float]:
+    samples = sorted(h["samples"])
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]  # noqa: E731
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99)}
+
+def _prom_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_prometheus() -> str:
+    lines = [
+        "# HELP auto_bot_phase_ms Длительность фаз обработки карточки, мс",
+        "# TYPE auto_bot_phase_ms summary",
+    ]
+    for profile, phases in sorted(PHASE_METRICS.items()):
+        for phase, h in sorted(phases.items()):
+            labels = f'profile="{_prom_label(profile)}",phase="{_prom_label(phase)}"'
+            for name, value in phase_percentiles(h).items():
+                quantile = {"p50": "0.5", "p95": "0.95", "p99": "0.99"}[name]
+                lines.append(f'auto_bot_phase_ms{{{labels},quantile="{quantile}"}} {value:.1f}')
+            lines.append(f"auto_bot_phase_ms_sum{{{labels}}} {h['sum_ms']:.1f}")
+            lines.append(f"auto_bot_phase_ms_count{{{labels}}} {h['count']}")
+    lines += [
+        "# HELP auto_bot_phase_failures_total Неудачные попытки фазы",
+        "# TYPE auto_bot_phase_failures_total counter",
+    ]
+    for profile, phases in sorted(PHASE_METRICS.items()):
+        for phase, h in sorted(phases.items()):
+            lines.append(f'auto_bot_phase_failures_total{{profile="{_prom_label(profile)}",phase="{_prom_label(phase)}"}} {h["fails"]}')
+    lines += [
+        "# HELP auto_bot_cards_processed Обработано карточек за текущий запуск",
+        "# TYPE auto_bot_cards_processed gauge",
+    ]
+    for profile, stats in sorted(PROFILE_STATS.items()):
+        lines.append(f'auto_bot_cards_processed{{profile="{_prom_label(profile)}"}} {stats.get("processed", 0)}')
+    lines += [
+        "# HELP auto_bot_open_total Попытки открыть карточку по путям (route, dispatch, cascade)",
+        "# TYPE auto_bot_open_total counter",
+    ]
+    for profile, paths in sorted(OPEN_PATH_STATS.items()):
+        for path, counts in sorted(paths.items()):
+            for result, key in (("hit", "hits"), ("fail", "fails")):
+                lines.append(
+                    f'auto_bot_open_total{{profile="{_prom_label(profile)}",path="{path}",result="{result}"}} {counts[key]}'
+                )
+    return "\n".join(lines) + "\n"
+
+def flush_metrics(force: bool = False) -> None:
+    """Дописывает накопленные события и обновляет файл Prometheus не чаще раза в METRICS_FLUSH_INTERVAL_S."""
+    now = time.time()
+    if not force and now - _METRICS_META["flushed_at"] < METRICS_FLUSH_INTERVAL_S:
+        return
+    _METRICS_META["flushed_at"] = now
+    pending, _METRICS_META["pending"] = _METRICS_META["pending"], []
+    try:
+        d = os.path.dirname(METRICS_EVENTS_PATH)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        if pending:
+            with open(METRICS_EVENTS_PATH, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in pending)
+        write_text_atomic(METRICS_PROM_PATH, render_prometheus())
+    except Exception:
+        pass
+
+def measured_rate_text(profile_name: str) -> str:
+    """Производительность по замерам: фактический темп запуска, иначе — по медиане времени на карточку."""
+    stats = PROFILE_STATS.get(profile_name)
+    card = PHASE_METRICS.get(profile_name, {}).get("card")
+    if stats and stats.get("processed"):
+        rate = stats_rate_per_hour(stats)
+    elif card and card["samples"]:
+        rate = int(3600000 / max(1.0, phase_percentiles(card)["p50"]) * max(1, WORKERS_STATE["value"]))
+    else:
+        return "нет замеров — появятся после первых карточек"
+    text = f"{rate} трансляций/час"
+    if card and card["samples"]:
+        pct = phase_percentiles(card)
+        text += f" · карточка p50 {pct['p50'] / 1000:.1f} с, p95 {pct['p95'] / 1000:.1f} с"
+    return text
+
+# ====== Авто‑темп (AIMD): скорость и число воркеров подбираются по ошибкам и задержке сервера ======
+AUTO_SPEED_DEFAULT = os.getenv("AUTO_SPEED", "0") != "0"
+SPEED_MIN = 0.2
+SPEED_MAX = 3.0
+# Аддитивный шаг вверх после серии успешных карточек и мультипликативный откат при сбое
+PACE_STEP = 0.1
+PACE_BACKOFF = 0.7
+PACE_INCREASE_EVERY = 5
+# Ответ сервера во столько раз медленнее обычного — признак перегрузки
+PACE_LATENCY_FACTOR = 2.0
+# Одна волна ошибок (например, у нескольких воркеров сразу) — одно снижение
+PACE_COOLDOWN_S = 5.0
+PACE_STATE: dict = {
+    "enabled": AUTO_SPEED_DEFAULT, "workers": WORKERS_DEFAULT,
+    "streak": 0, "baseline_ms": 0.0, "backoff_at": 0.0,
+}
+# Припаркованные воркеры: (цикл, событие). Будятся, когда меняется лимит активных воркеров
+PACE_WAITERS: set = set()
+
+def pace_wake() -> None:
+    """Будит припаркованных воркеров; безопасно вызывать из потока окна."""
+    for loop, event in list(PACE_WAITERS):
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:  # цикл уже закрыт
+            PACE_WAITERS.discard((loop, event))
+
+def pace_reset(workers: int) -> None:
+    """Начало запуска: авто‑темп стартует с выбранной скорости и всех настроенных воркеров."""
+    PACE_STATE.update({"workers": max(1, workers), "streak": 0, "baseline_ms": 0.0, "backoff_at": 0.0})
+    pace_wake()
+
+def active_workers(configured: int) -> int:
+    """Сколько воркеров из настроенных сейчас берут карточки."""
+    if not PACE_STATE["enabled"]:
+        return configured
+    return max(1, min(configured, PACE_STATE["workers"]))
+
+async def wait_worker_slot(number: int, configured: int) -> None:
+    """Паркует воркера, пока авто‑темп держит активными меньше number воркеров."""
+    if number <= active_workers(configured):
+        return
+    event = asyncio.Event()
+    waiter = (asyncio.get_running_loop(), event)
+    PACE_WAITERS.add(waiter)
+    try:
+        while number > active_workers(configured):
+            event.clear()
+            await event.wait()
+    finally:
+        PACE_WAITERS.discard(waiter)
+
+def pace_summary() -> str:
+    text = f"скорость {SPEED_STATE['value']:.1f}×"
+    if WORKERS_STATE["value"] > 1:
+        text += f", воркеров {active_workers(WORKERS_STATE['value'])} из {WORKERS_STATE['value']}"
+    return text
+
+def pace_observe(ok: bool, ack_ms: float | None = None) -> None:
+    """Итог карточки для авто‑темпа: сбой открытия/сохранения или медленный ответ — откат, серия успехов — шаг вверх."""
+    if not PACE_STATE["enabled"]:
+        return
+    speed = SPEED_STATE["value"]
+    workers = PACE_STATE["workers"]
+    limit = WORKERS_STATE["value"]
+    baseline = PACE_STATE["baseline_ms"]
+    slow = ok and ack_ms is not None and baseline > 0 and ack_ms > baseline * PACE_LATENCY_FACTOR
+    if ok and ack_ms is not None and not slow:
+        PACE_STATE["baseline_ms"] = ack_ms if baseline <= 0 else baseline * 0.9 + ack_ms * 0.1
+    if not ok or slow:
+        PACE_STATE["streak"] = 0
+        now = time.time()
+        if now - PACE_STATE["backoff_at"] < PACE_COOLDOWN_S:
+            return
+        PACE_STATE["backoff_at"] = now
+        if slow and workers > 1:
+            # Сервер отвечает медленнее — снимаем нагрузку числом вкладок
+            workers = max(1, workers // 2)
+        else:
+            # Карточки не успевают открыться/сохраниться — удлиняем ожидания
+            speed = max(SPEED_MIN, round(speed * PACE_BACKOFF, 2))
+        reason = f"ответ сервера {int(ack_ms)} мс" if slow else "ошибка карточки"
+    else:
+        PACE_STATE["streak"] += 1
+        if PACE_STATE["streak"] < PACE_INCREASE_EVERY * max(1, workers):
+            return
+        PACE_STATE["streak"] = 0
+        if speed < SPEED_MAX:
+            speed = min(SPEED_MAX, round(speed + PACE_STEP, 2))
+        elif workers < limit:
+            workers += 1
+        else:
+            return
+        reason = "без ошибок"
+    if speed == SPEED_STATE["value"] and workers == PACE_STATE["workers"]:
+        return
+    SPEED_STATE["value"] = speed
+    PACE_STATE["workers"] = workers
+    pace_wake()
+    publish("pace", pace_summary())
+    log(f"Авто‑темп: {pace_summary()} ({reason})")
+
 # Настройки авто-логина
 AUTO_LOGIN_ENABLED = True
 USERNAME_ENV = "SP_USERNAME"
@@ -544,12 +1212,72 @@ def resolve_selector_overrides() -> tuple[list[str], list[str], list[str]]:
     submit_selectors = [submit_override] if submit_override else DEFAULT_SUBMIT_SELECTORS
     return username_selectors, password_selectors, submit_selectors
 
-async def attempt_auto_login(page) -> bool:
+# Находит первый подходящий селектор для каждой роли. Понимает обычный CSS и `tag:has-text("…")` из Playwright
+LOGIN_DISCOVERY_JS = """
+(args) => {
+  const visible = (el) => {
+    if (!el) return false;
+    const st = getComputedStyle(el);
+    if (st.visibility === 'hidden' || st.display === 'none') return false;
+    return el.getClientRects().length > 0;
+  };
+  const matches = (sel) => {
+    try {
+      const m = sel.match(/^(.*?):has-text\\(["'](.*)["']\\)$/);
+      if (m) {
+        const needle = m[2].toLowerCase();
+        return Array.from(document.querySelectorAll(m[1] || '*'))
+          .some((el) => visible(el) && (el.innerText || '').toLowerCase().includes(needle));
+      }
+      return Array.from(document.querySelectorAll(sel)).some(visible);
+    } catch (e) {
+      return false;
+    }
+  };
+  const first = (list) => list.find(matches) || null;
+  const result = {
+    logged_in: matches(args.icon),
+    username: first(args.username),
+    password: first(args.password),
+    submit: first(args.submit),
+  };
+  return (result.logged_in || (result.username && result.password)) ? result : null;
+}
+"""
+# Сколько ждать появления формы логина (одна проверка в странице вместо перебора по 2 с)
+LOGIN_DISCOVERY_MS = 5000
+
+async def discover_login_form(page, username_selectors: list[str], password_selectors: list[str], submit_selectors: list[str]) -> dict:
+    """Одним wait_for_function ищет поля логина/пароля и кнопку входа. Победители запоминаются в рейтинге."""
+    roles = {
+        "username": rank_candidates("login_username", username_selectors),
+        "password": rank_candidates("login_password", password_selectors),
+        "submit": rank_candidates("login_submit", submit_selectors),
+    }
+    started = time.perf_counter()
+    try:
+        handle = await page.wait_for_function(
+            LOGIN_DISCOVERY_JS,
+            arg={"icon": ICON_SELECTOR, **roles},
+            timeout=TO(LOGIN_DISCOVERY_MS),
+        )
+        found = await handle.json_value() or {}
+    except Exception:
+        return {}
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for role in ("username", "password", "submit"):
+        if found.get(role):
+            record_outcome(f"login_{role}", found[role], True, elapsed_ms)
+    return found
+
+async def attempt_auto_login(page, username: str | None = None, password: str | None = None) -> bool:
     if not AUTO_LOGIN_ENABLED:
         return False
 
-    username = os.getenv(USERNAME_ENV)
-    password = os.getenv(PASSWORD_ENV)
+    if username is None:
+        username = os.getenv(USERNAME_ENV)
+    if password is None:
+        password = os.getenv(PASSWORD_ENV)
     if not username or not password:
         log("Переменные окружения SP_USERNAME/SP_PASSWORD не заданы — авто‑логин пропущен")
         return False
@@ -557,96 +1285,49 @@ async def attempt_auto_login(page) -> bool:
     log(f"Пробую авто‑логин как: {username}")
     username_selectors, password_selectors, submit_selectors = resolve_selector_overrides()
 
-    # Если уже авторизованы и видим элементы — сразу успех
-    try:
-        await page.locator(ICON_SELECTOR).first.wait_for(timeout=TO(1000))
+    # Поля логина/пароля, кнопку входа и признак уже открытой сессии ищем одним вызовом в странице
+    found = await discover_login_form(page, username_selectors, password_selectors, submit_selectors)
+    if found.get("logged_in"):
         log("Уже авторизованы — элементы страницы найдены")
         return True
-    except PWTimeout:
-        pass
-
-    # Пытаемся найти поля логина/пароля
-    username_locator = None
-    password_locator = None
-
-    # 1) Сначала пробуем найти форму логина на текущем экране
-    for css in username_selectors:
-        locator = page.locator(css).first
-        try:
-            await locator.wait_for(timeout=TO(2000))
-            username_locator = locator
-            log(f"Нашёл поле логина по селектору: {css}")
-            break
-        except PWTimeout:
-            continue
 
-    for css in password_selectors:
-        locator = page.locator(css).first
+    if not (found.get("username") and found.get("password")):
+        # Пробуем перейти на явную страницу логина и искать снова
         try:
-            await locator.wait_for(timeout=TO(2000))
-            password_locator = locator
-            log(f"Нашёл поле пароля по селектору: {css}")
-            break
-        except PWTimeout:
-            continue
-
-    if not username_locator or not password_locator:
-        # 2) Пробуем перейти на явную страницу логина и искать снова
-        try:
-            parts = urlsplit(page.url)
-            login_url = urlunsplit((parts.scheme, parts.netloc, parts.path, parts.query, 'login'))
             # Для hash-router (как у SmartPlayer) корректнее заменить hash
+            parts = urlsplit(page.url)
             base = parts.scheme + '://' + parts.netloc + (parts.path or '/')
             login_url = base + '#/login'
             await page.goto(login_url, wait_until="load")
             log(f"Перешёл на страницу логина: {login_url}")
-            await page.wait_for_load_state("networkidle", timeout=TO(1500))
         except Exception:
             pass
+        found = await discover_login_form(page, username_selectors, password_selectors, submit_selectors)
+        if found.get("logged_in"):
+            log("Уже авторизованы — элементы страницы найдены")
+            return True
 
-        # Повторный поиск полей
-        for css in username_selectors:
-            locator = page.locator(css).first
-            try:
-                await locator.wait_for(timeout=TO(2000))
-                username_locator = locator
-                log(f"Нашёл поле логина по селектору: {css}")
-                break
-            except PWTimeout:
-                continue
-
-        for css in password_selectors:
-            locator = page.locator(css).first
-            try:
-                await locator.wait_for(timeout=TO(2000))
-                password_locator = locator
-                log(f"Нашёл поле пароля по селектору: {css}")
-                break
-            except PWTimeout:
-                continue
-
-    if not username_locator or not password_locator:
+    if not (found.get("username") and found.get("password")):
         log("Не удалось найти поля логина/пароля — авто‑логин не выполнен")
         return False
+    log(f"Нашёл поле логина по селектору: {found['username']}")
+    log(f"Нашёл поле пароля по селектору: {found['password']}")
+    username_locator = page.locator(found["username"]).first
+    password_locator = page.locator(found["password"]).first
 
     # Вводим логин/пароль (fill исключает дублирование)
     await username_locator.fill(username)
     await password_locator.fill(password)
 
-    # Нажимаем кнопку входа
+    # Нажимаем кнопку входа (найденную вместе с полями)
     clicked = False
-    for css in submit_selectors:
+    if found.get("submit"):
         try:
-            submit_btn = page.locator(css).first
-            await submit_btn.wait_for(timeout=1000)
-            await submit_btn.click()
-            log(f"Нажал кнопку входа: {css}")
+            await page.locator(found["submit"]).first.click(timeout=TO(2000))
+            log(f"Нажал кнопку входа: {found['submit']}")
             clicked = True
-            break
-        except PWTimeout:
-            continue
         except Exception:
-            continue
+            pass
 
     if not clicked:
         # Пробуем нажать Enter в поле пароля
@@ -665,54 +1346,389 @@ async def attempt_auto_login(page) -> bool:
         log("Авто‑логин неуспешен — не дождался элементов страницы")
         return False
 
-async def open_save_close(page, icon, index):
+# ====== Прямое открытие карточки по id плитки ======
+# OPEN_MODE: auto — сначала напрямую (маршрут карточки или событие dblclick на плитке), каскад кликов — запасной путь;
+# click — только каскад кликов
+OPEN_MODE = os.getenv("OPEN_MODE", "auto").strip().lower()
+# Маршрут карточки в hash‑роутере CMS, например "#/broadcasts/{id}?folderId={folder}" (пусто — не используется)
+CARD_ROUTE_TEMPLATE = os.getenv("CARD_ROUTE_TEMPLATE", "")
+# Прямой путь, не сработавший столько раз подряд, до конца запуска не пробуется
+DIRECT_OPEN_GIVE_UP = 3
+# Бюджет на распознавание карточки после прямого открытия: оно либо срабатывает сразу, либо не срабатывает —
+# промах не должен стоить полного OPEN_DETECT_MS перед каскадом кликов
+DIRECT_OPEN_DETECT_MS = 2000
+# Профиль -> путь открытия ("route", "dispatch", "cascade") -> {"hits", "fails", "streak"} (streak — промахов подряд)
+OPEN_PATH_STATS: dict[str, dict[str, dict]] = {}
+
+# Повтор того же маршрута не меняет location.hash — тогда роутеру отправляется hashchange вручную
+OPEN_ROUTE_JS = """
+(route) => {
+  if (location.hash === '#' + route) window.dispatchEvent(new HashChangeEvent('hashchange'));
+  else location.hash = route;
+}
+"""
+
+# Событие dblclick на иконке (всплывает к плитке): без прокрутки, ожидания анимаций и проверки перекрытия
+DISPATCH_DBLCLICK_JS = """
+(args) => {
+  const tile = document.getElementById(args.id);
+  if (!tile) return false;
+  let target = tile;
+  try { target = tile.querySelector(args.icon) || tile; } catch (e) {}
+  target.dispatchEvent(new MouseEvent('dblclick', {bubbles: true, cancelable: true, view: window, detail: 2}));
+  return true;
+}
+"""
+
+def record_open_path(path: str, ok: bool) -> None:
+    counts = OPEN_PATH_STATS.setdefault(current_profile_name(), {}).setdefault(path, {"hits": 0, "fails": 0, "streak": 0})
+    counts["hits" if ok else "fails"] += 1
+    counts["streak"] = 0 if ok else counts["streak"] + 1
+
+def open_path_summary(profile_name: str) -> dict:
+    """Попадания по путям открытия: путь -> {hits, fails, hit_rate}."""
+    return {
+        path: {
+            "hits": counts["hits"],
+            "fails": counts["fails"],
+            "hit_rate": round(counts["hits"] / max(1, counts["hits"] + counts["fails"]), 3),
+        }
+        for path, counts in sorted(OPEN_PATH_STATS.get(profile_name, {}).items())
+    }
+
+def open_path_text(profile_name: str) -> str:
+    return ", ".join(
+        f"{path} {int(row['hit_rate'] * 100)}% ({row['hits']}/{row['hits'] + row['fails']})"
+        for path, row in open_path_summary(profile_name).items()
+    )
+
+def direct_open_paths() -> list[str]:
+    if OPEN_MODE == "click":
+        return []
+    paths = ["route", "dispatch"] if CARD_ROUTE_TEMPLATE else ["dispatch"]
+    counts = OPEN_PATH_STATS.get(current_profile_name(), {})
+    return [p for p in paths if counts.get(p, {}).get("streak", 0) < DIRECT_OPEN_GIVE_UP]
+
+def grid_hash(url: str) -> str:
+    return url.split("#", 1)[1] if "#" in url else ""
+
+async def restore_grid_route(page, route: str) -> None:
+    """Возвращает hash‑маршрут сетки, если после карточки роутер остался на её маршруте."""
+    try:
+        if route and grid_hash(page.url) != route:
+            await page.evaluate("(h) => { location.hash = h; }", route)
+    except Exception:
+        pass
+
+async def open_card_direct(page, path: str, tile_id: str) -> bool:
+    try:
+        if path == "route":
+            broadcast_id = broadcast_id_from_tile(tile_id)
+            if not broadcast_id:
+                return False
+            route = CARD_ROUTE_TEMPLATE.format(id=broadcast_id, folder=folder_id_from_url(page.url)).lstrip("#")
+            await page.evaluate(OPEN_ROUTE_JS, route)
+        elif not await page.evaluate(DISPATCH_DBLCLICK_JS, {"id": tile_id, "icon": TILE_ICON_SELECTOR}):
+            return False
+    except Exception:
+        return False
+    return await wait_card_open(page, timeout=DIRECT_OPEN_DETECT_MS)
+
+async def open_card(page, icon, tile_id: str | None = None, prepared: dict | None = None) -> str | None:
+    """Открывает карточку: сначала напрямую по id плитки, затем каскадом кликов. Возвращает сработавший путь или None."""
+    route_before = grid_hash(page.url)
+    for path in direct_open_paths() if tile_id else []:
+        started = time.perf_counter()
+        ok = await open_card_direct(page, path, tile_id)
+        record_phase("open_direct", started, ok)
+        record_open_path(path, ok)
+        if ok:
+            return path
+        if path == "route":
+            await restore_grid_route(page, route_before)
+    ok = await try_click_sequence(page, icon, prepared)
+    record_open_path("cascade", ok)
+    return "cascade" if ok else None
+
+async def close_open_card(page) -> None:
+    """Закрывает карточку, оставшуюся от прерванного шага, чтобы повтор начинался с сетки."""
+    try:
+        await page.keyboard.press("Escape")
+        close_btn = page.locator(CLOSE_BTN).first
+        if await close_btn.is_visible():
+            await close_btn.click(timeout=TO(2000))
+    except Exception:
+        pass
+
+# ====== Конвейер карточек: стадии и модальный шлюз ======
+# Стадии карточки идут строго по порядку; failed — конечная стадия при ошибке на любом шаге,
+# forced — сохранена, но сама не закрылась (её закрыл модальный шлюз)
+CARD_STAGES = ("locate", "open", "save", "confirm", "closed")
+CARD_FINAL_STAGES = ("closed", "forced", "failed")
+# Сколько карточек одновременно в работе на одной вкладке: 1 — следующая начинается после закрытия предыдущей,
+# 2 — сразу после ответа сервера на сохранение, пока предыдущая закрывается. Модалка на вкладке одна,
+# поэтому больше двух карточек в работе быть не может
+PIPELINE_DEPTH = max(1, min(2, int(os.getenv("PIPELINE_DEPTH", "2"))))
+
+def card_stage(card: dict, stage: str) -> None:
+    """Переводит карточку в следующую стадию; переход назад или из конечной стадии — ошибка конвейера."""
+    current = card.get("stage")
+    if current in CARD_FINAL_STAGES or (
+        stage in CARD_STAGES and current is not None and CARD_STAGES.index(stage) <= CARD_STAGES.index(current)
+    ) or (stage == "forced" and current != "confirm"):
+        raise RuntimeError(f"Недопустимый переход карточки: {current} → {stage}")
+    card["stage"] = stage
+    card.setdefault("at", {})[stage] = time.perf_counter()
+
+def modal_gate() -> dict:
+    """Модальный шлюз вкладки: хвост закрытия предыдущей карточки и счётчик принудительных закрытий."""
+    return {"closing": None, "forced": 0}
+
+async def wait_modal_free(page, gate: dict | None) -> bool:
+    """Не даёт двум карточкам оказаться открытыми одновременно: ждёт закрытия предыдущей, иначе закрывает её сама.
+
+    False — предыдущая карточка сама не закрылась и была закрыта принудительно.
+    """
+    if gate is None or gate["closing"] is None:
+        return True
+    task, gate["closing"] = gate["closing"], None
+    try:
+        closed = await task
+    except Exception:
+        closed = False
+    if not closed:
+        gate["forced"] += 1
+        log("Предыдущая карточка ещё открыта — закрываю её перед открытием следующей")
+        await close_open_card(page)
+    return bool(closed)
+
+def drop_modal_gate(gate: dict | None) -> None:
+    """Отменяет незавершённый хвост закрытия: вкладка больше не обслуживается (воркер остановлен)."""
+    task = gate["closing"] if gate is not None else None
+    if task is not None and not task.done():
+        task.cancel()
+
+def close_task_stage(task) -> str:
+    """Конечная стадия карточки по итогу ожидания её автозакрытия."""
+    if task.cancelled() or task.exception() is not None:
+        return "forced"
+    return "closed" if task.result() else "forced"
+
+async def open_save_close(
+    page, icon, index, prepared: dict | None = None, on_open=None, tile_id: str | None = None, gate: dict | None = None,
+):
+    """Проводит карточку по стадиям locate → open → save → confirm → closed.
+
+    on_open() вызывается сразу после открытия — пока идёт сохранение, можно готовить следующие плитки.
+    tile_id включает прямое открытие по id плитки (OPEN_MODE=auto).
+    gate — модальный шлюз вкладки (modal_gate): с ним функция возвращается по ответу сервера, а закрытие
+    карточки дожидается уже следующая — пока оно идёт, она готовит свою плитку (prefetch_tiles).
+    """
     log(f"Открываю карточку #{index+1}")
-    open_ok = await try_click_sequence(page, icon)
-    if not open_ok:
-        raise Exception("Не удалось открыть карточку: не появилась кнопка сохранения")
-    await page.wait_for_timeout(AD(OPEN_WAIT_MS))
+    card = {"tile_id": tile_id, "stage": None}
+    card_stage(card, "locate")
+    card_started = time.perf_counter()
+    ok = False
+    ack = None
+    route_before = grid_hash(page.url)
+    opened_by = None
+    try:
+        if gate is not None and gate["closing"] is not None and prepared is None and tile_id:
+            # Пока предыдущая карточка закрывается, готовим эту плитку: координаты иконки и подкрутка к ней
+            ready, _free = await asyncio.gather(prefetch_tiles(page, [tile_id]), wait_modal_free(page, gate))
+            prepared = ready.get(tile_id)
+        card_stage(card, "open")
+        await wait_modal_free(page, gate)
+        # Открытие (до CLICK_TIMEOUT на попытку) прерывается паузой и повторяется после неё
+        opened_by = await run_pausable(lambda: open_card(page, icon, tile_id, prepared), lambda: close_open_card(page))
+        if not opened_by:
+            raise Exception("Не удалось открыть карточку: не появилась кнопка сохранения")
+        if on_open is not None:
+            on_open()
+        card_stage(card, "save")
+        settle_started = time.perf_counter()
+        await page.wait_for_timeout(AD(OPEN_WAIT_MS))
+        record_phase("open_settle", settle_started)
+
+        # Сохранение
+        ack = await save_current_card(page, gate, broadcast_id_from_tile(tile_id))
+        card_stage(card, "confirm")
+        closing = gate["closing"] if gate is not None else None
+        if closing is not None and opened_by != "route":
+            closing.add_done_callback(lambda task: card_stage(card, close_task_stage(task)))
+        else:
+            # Маршрут сетки восстанавливается после закрытия — хвост закрытия дожидаемся здесь
+            card_stage(card, "closed" if await wait_modal_free(page, gate) else "forced")
+        ok = True
+        return ack
+    finally:
+        if not ok:
+            log(f"Карточка остановилась на стадии «{card['stage']}»")
+            card_stage(card, "failed")
+            # Открытая, но не сохранённая карточка закрывается, чтобы следующая не открылась поверх неё
+            if opened_by:
+                await close_open_card(page)
+        if opened_by == "route":
+            await restore_grid_route(page, route_before)
+        record_phase("card", card_started, ok)
+        pace_observe(ok, ack["latency_ms"] if ack else None)
+
+# Подтверждение сохранения ответом сервера: регулярка для URL запроса сохранения.
+# Пусто — берём шаблон, запомненный режимом API, иначе ждём первый изменяющий XHR/fetch после клика
+SAVE_URL_PATTERN = os.getenv("SAVE_URL_PATTERN", "")
+SAVE_ACK_TIMEOUT_MS = int(os.getenv("SAVE_ACK_TIMEOUT_MS", "8000"))
+
+def save_response_matcher(broadcast_id: str = ""):
+    """Предикат для page.wait_for_event("response"): распознаёт ответ на запрос сохранения карточки.
+
+    URL сверяется с SAVE_URL_PATTERN, запомненным запросом режима api или хотя бы с id трансляции карточки.
+    None — сверять не с чем: любой изменяющий XHR (автосохранение, аналитика) подтверждением не считаем.
+    """
+    pattern = SAVE_URL_PATTERN
+    id_token = r"[^/?#]+"
+    if broadcast_id:
+        id_token = re.escape(broadcast_id)
+    if not pattern:
+        template = (API_CAPTURES.get(current_profile_name()) or {}).get("template")
+        if template:
+            path = re.escape(template["url"].split("?")[0])
+            source = re.escape(template["source_id"])
+            pattern = "^" + re.sub(rf"(?<![0-9A-Za-z]){re.escape(source)}(?![0-9A-Za-z])", lambda _m: id_token, path)
+        elif broadcast_id:
+            pattern = rf"(?<![0-9A-Za-z]){id_token}(?![0-9A-Za-z])"
+    if not pattern:
+        return None
+    regex = re.compile(pattern)
+
+    def is_save_response(response) -> bool:
+        request = response.request
+        if request.method not in ("POST", "PUT", "PATCH") or request.resource_type not in ("xhr", "fetch"):
+            return False
+        return bool(regex.search(response.url))
+
+    return is_save_response
+
+async def wait_save_ack(ack_task, clicked_at: float) -> dict | None:
+    """Дожидается ответа сервера на сохранение: статус, задержка от клика и начало тела ответа."""
+    try:
+        response = await ack_task
+    except Exception:
+        return None
+    latency_ms = (time.perf_counter() - clicked_at) * 1000
+    try:
+        body = (await response.text())[:200]
+    except Exception:
+        body = ""
+    return {"status": response.status, "latency_ms": latency_ms, "body": body, "url": response.url}
 
-    # Сохранение
-    await save_current_card(page)
+async def wait_card_closed(page, css: str) -> bool:
+    """Ждёт автозакрытия карточки после подтверждённого сохранения: кнопка сохранения исчезает из DOM."""
+    close_started = time.perf_counter()
+    try:
+        await page.locator(css).first.wait_for(state="detached", timeout=5000)
+        record_phase("close", close_started)
+        log("Карточка закрылась автоматически (кнопка сохранения исчезла)")
+        return True
+    except Exception:
+        record_phase("close", close_started, False)
+        log("Карточка не закрылась автоматически за отведённое время — продолжаю")
+        return False
+
+async def save_current_card(page, gate: dict | None = None, broadcast_id: str = "") -> dict | None:
+    """Сохраняет открытую карточку. Завершение определяется по ответу сервера; тосты — запасной вариант.
+
+    broadcast_id — id трансляции карточки: по нему узнаётся ответ на сохранение, если шаблона URL нет.
 
-async def save_current_card(page) -> None:
+    Возвращает сведения об ответе сервера (status, latency_ms, body, url) или None, если ответа не дождались.
+    С gate (PIPELINE_DEPTH=2) после ответа сервера автозакрытие не ждёт: оно уходит в gate["closing"].
+    """
     # Ищем рабочую кнопку "Сохранить" из списка кандидатов
-    clicked = False
-    for css in SAVE_CANDIDATES:
+    clicked_css = None
+    clicked_at = 0.0
+    ack_task = None
+    ack = None
+    matcher = save_response_matcher(broadcast_id)
+    try:
+        lookup_started = time.perf_counter()
+        for css in rank_candidates("save", SAVE_CANDIDATES):
+            started = time.perf_counter()
+            try:
+                btn = page.locator(css).first
+                await btn.wait_for(timeout=TO(2000))
+                await highlight_locator(page, btn)
+                if ack_task is None and matcher is not None:
+                    # Подписываемся на ответ до клика, чтобы не пропустить быстрый ответ
+                    ack_task = asyncio.ensure_future(page.wait_for_event(
+                        "response",
+                        predicate=matcher,
+                        timeout=TO(SAVE_ACK_TIMEOUT_MS),
+                    ))
+                await btn.click()
+                clicked_at = time.perf_counter()
+                record_outcome("save", css, True, (clicked_at - started) * 1000)
+                log(f"Нажал Сохранить: {css}")
+                clicked_css = css
+                break
+            except Exception:
+                record_outcome("save", css, False, (time.perf_counter() - started) * 1000)
+                continue
+        record_phase("save_lookup", lookup_started, bool(clicked_css))
+        if not clicked_css:
+            raise Exception("Кнопка Сохранить не найдена")
+
+        # ждём подтверждение (если есть)
+        # 1) модалка подтверждения
+        confirm_started = time.perf_counter()
+        confirmed = False
         try:
-            btn = page.locator(css).first
-            await btn.wait_for(timeout=TO(2000))
-            await highlight_locator(page, btn)
-            await btn.click()
-            log(f"Нажал Сохранить: {css}")
-            clicked = True
-            break
+            await page.locator(CONFIRM_TEXT).first.wait_for(timeout=TO(1200))
+            yes_btn = page.locator(CONFIRM_YES).first
+            await highlight_locator(page, yes_btn)
+            await yes_btn.click()
+            confirmed = True
+            log("Подтвердил сохранение (Да)")
         except Exception:
-            continue
-    if not clicked:
-        raise Exception("Кнопка Сохранить не найдена")
+            pass
+        record_phase("confirm", confirm_started, confirmed)
 
-    # ждём подтверждение (если есть)
-    # 1) модалка подтверждения
-    try:
-        await page.locator(CONFIRM_TEXT).first.wait_for(timeout=TO(1200))
-        yes_btn = page.locator(CONFIRM_YES).first
-        await highlight_locator(page, yes_btn)
-        await yes_btn.click()
-        log("Подтвердил сохранение (Да)")
-    except Exception:
-        pass
-    # 2) тосты/хинты
+        # 2) ответ сервера на запрос сохранения (не с чем сверить URL — сразу к тостам)
+        if ack_task is not None:
+            ack = await wait_save_ack(ack_task, clicked_at)
+            record_phase("ack", clicked_at, ack is not None)
+    finally:
+        if ack_task is not None and not ack_task.done():
+            ack_task.cancel()
+
+    if ack is not None:
+        if ack["status"] >= 400:
+            raise Exception(f"Сервер отклонил сохранение: HTTP {ack['status']} {ack['body'][:80]}")
+        log(f"Получил подтверждение сохранения: HTTP {ack['status']} за {int(ack['latency_ms'])} мс")
+        # Сервер подтвердил — без тостов и фиксированных пауз остаётся только автозакрытие карточки
+        if gate is not None:
+            gate["closing"] = asyncio.ensure_future(wait_card_closed(page, clicked_css))
+        else:
+            await wait_card_closed(page, clicked_css)
+        return ack
+
+    # Ответа сервера не дождались (другой URL сохранения?) — определяем по тостам, как раньше
+    toast_started = time.perf_counter()
+    toast_seen = False
     for hint in SUCCESS_HINTS:
         try:
             await page.locator(hint).first.wait_for(timeout=TO(2500))
             log("Получил подтверждение сохранения")
+            toast_seen = True
             break
         except PWTimeout:
             continue
+    record_phase("toast", toast_started, toast_seen)
+    settle_started = time.perf_counter()
     await page.wait_for_timeout(AD(AFTER_SAVE_WAIT_MS))
+    record_phase("after_save", settle_started)
 
     # Не закрываем карточку вручную. Ждём автозакрытие после сохранения
+    close_started = time.perf_counter()
+    closed = True
     try:
         await page.locator(SAVE_BTN).first.wait_for(state="detached", timeout=5000)
         log("Карточка закрылась автоматически (кнопка сохранения исчезла)")
@@ -722,7 +1738,10 @@ async def save_current_card(page) -> None:
             await page.locator(ICON_SELECTOR).first.wait_for(timeout=5000)
             log("Карточка закрылась автоматически (виден список карточек)")
         except Exception:
+            closed = False
             log("Карточка не закрылась автоматически за отведённое время — продолжаю")
+    record_phase("close", close_started, closed)
+    return None
 
 async def open_by_title_and_save(page, clickable_locator, index, title_text: str) -> None:
     log(f"Открываю карточку по названию #{index+1}: {title_text}")
@@ -732,219 +1751,1484 @@ async def open_by_title_and_save(page, clickable_locator, index, title_text: str
     await page.wait_for_timeout(OPEN_WAIT_MS)
     await save_current_card(page)
 
-async def process_all(page):
+# ====== Прямое сохранение через API (повтор запроса, который отправляет UI) ======
+# Режим сохранения: ui — кликами по карточкам, api — повтор HTTP‑запроса сохранения (UI остаётся запасным путём)
+SAVE_MODE = os.getenv("SAVE_MODE", "ui").strip().lower()
+API_SAVE_CONCURRENCY = max(1, int(os.getenv("API_SAVE_CONCURRENCY", "4")))
+API_CAPTURE_PATH = os.getenv("API_CAPTURE_PATH", os.path.join(os.path.dirname(STATE_PATH) or ".", "api_capture.json"))
+TILE_ID_PREFIX = "broadcast_broadcast_"
+# Заголовки, которые не переносим при повторе: их выставляет сам Playwright (куки — из контекста)
+_API_SKIP_HEADERS = {"cookie", "host", "content-length", "connection", "accept-encoding", "origin", "referer"}
+# Профиль -> {"template": {...} | None, "recent": [...], "listing": {folderId: set[id]}, "failed": set[str]}
+API_CAPTURES: dict[str, dict] = {}
+
+def current_profile_name() -> str:
+    return CURRENT_PROFILE.get() or ACTIVE_PROFILE_NAME["name"]
+
+def broadcast_id_from_tile(tile_id: str | None) -> str:
+    if tile_id and tile_id.startswith(TILE_ID_PREFIX):
+        return tile_id[len(TILE_ID_PREFIX):]
+    return ""
+
+def folder_id_from_url(url: str) -> str:
+    match = re.search(r"folderId=([^&#]+)", url or "")
+    return match.group(1) if match else ""
+
+def load_api_templates() -> dict:
+    try:
+        with open(API_CAPTURE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return data
+    except Exception:
+        pass
+    return {}
+
+def save_api_template(profile_name: str, template: dict) -> None:
+    try:
+        data = load_api_templates()
+        data[profile_name] = template
+        write_json_atomic(API_CAPTURE_PATH, data)
+    except Exception:
+        pass
+
+def api_capture_for(profile_name: str) -> dict:
+    capture = API_CAPTURES.get(profile_name)
+    if capture is None:
+        template = load_api_templates().get(profile_name)
+        capture = {
+            "template": template if isinstance(template, dict) else None,
+            "recent": [],
+            "listing": {},
+            "failed": set(),
+        }
+        API_CAPTURES[profile_name] = capture
+    return capture
+
+def _extract_ids(payload) -> list[str]:
+    """Ищет в JSON‑ответе первый список объектов с полем id (список трансляций папки)."""
+    if isinstance(payload, list):
+        if payload and all(isinstance(x, dict) and "id" in x for x in payload):
+            return [str(x["id"]) for x in payload]
+        return []
+    if isinstance(payload, dict):
+        for value in payload.values():
+            ids = _extract_ids(value)
+            if ids:
+                return ids
+    return []
+
+def attach_api_capture(page, capture: dict) -> None:
+    """Слушает запросы вкладки: запоминает изменяющие XHR/fetch и списки трансляций текущей папки."""
+    if not page or getattr(page, "_auto_bot_capture", None) is capture:
+        return
+
+    async def on_request_finished(request) -> None:
+        try:
+            if request.method not in ("POST", "PUT", "PATCH") or request.resource_type not in ("xhr", "fetch"):
+                return
+            response = await request.response()
+            if response is None or response.status >= 400:
+                return
+            capture["recent"].append({
+                "method": request.method,
+                "url": request.url,
+                "headers": await request.all_headers(),
+                "body": request.post_data or "",
+            })
+            del capture["recent"][:-20]
+        except Exception:
+            pass
+
+    async def on_response(response) -> None:
+        try:
+            request = response.request
+            folder = folder_id_from_url(page.url)
+            if request.method != "GET" or request.resource_type not in ("xhr", "fetch") or not folder:
+                return
+            if folder not in response.url or response.status >= 400:
+                return
+            ids = _extract_ids(await response.json())
+            if ids:
+                capture["listing"].setdefault(folder, set()).update(ids)
+        except Exception:
+            pass
+
+    page.on("requestfinished", on_request_finished)
+    page.on("response", on_response)
+    page._auto_bot_capture = capture
+
+def learn_save_template(capture: dict, broadcast_id: str) -> None:
+    """После сохранения карточки через UI находит её запрос сохранения (в URL есть id) и запоминает как шаблон."""
+    if not broadcast_id or capture.get("template"):
+        return
+    for req in reversed(capture["recent"]):
+        if re.search(rf"(?<![0-9A-Za-z]){re.escape(broadcast_id)}(?![0-9A-Za-z])", req["url"]):
+            headers = {k: v for k, v in req["headers"].items() if k.lower() not in _API_SKIP_HEADERS and not k.startswith(":")}
+            template = {**req, "headers": headers, "source_id": broadcast_id}
+            capture["template"] = template
+            save_api_template(current_profile_name(), template)
+            log(f"Запомнил запрос сохранения: {req['method']} {req['url']}")
+            return
+
+async def api_save_card(context, template: dict, broadcast_id: str) -> bool:
+    """Пересохраняет карточку запросом как у UI: текущее состояние берётся GET‑ом того же ресурса."""
+    url = re.sub(
+        rf"(?<![0-9A-Za-z]){re.escape(template['source_id'])}(?![0-9A-Za-z])",
+        broadcast_id,
+        template["url"],
+    )
+    try:
+        current = await context.request.get(url, headers=template["headers"])
+        if not current.ok:
+            return False
+        state = await current.json()
+        body = template.get("body") or ""
+        try:
+            sent_shape = json.loads(body) if body else None
+        except Exception:
+            return False
+        if isinstance(sent_shape, dict):
+            # Отправляем те же поля, что и UI, но со значениями самой карточки
+            if not isinstance(state, dict) or not set(sent_shape) <= set(state):
+                return False
+            data = json.dumps({k: state[k] for k in sent_shape}, ensure_ascii=False)
+        elif sent_shape is None:
+            data = None
+        else:
+            return False
+        response = await context.request.fetch(url, method=template["method"], headers=template["headers"], data=data)
+        return response.ok
+    except Exception:
+        return False
+
+async def api_save_pending(page, capture: dict, broadcast_ids: list[str], seen_tile_ids: set[str], stats: dict, ledger: dict | None = None) -> int:
+    """Сохраняет карточки через API с ограниченной параллельностью. Неудачные остаются для UI."""
+    template = capture.get("template")
+    if SAVE_MODE != "api" or not template:
+        return 0
+    pending = [
+        bid for bid in dict.fromkeys(broadcast_ids)
+        if bid and TILE_ID_PREFIX + bid not in seen_tile_ids and bid not in capture["failed"]
+    ]
+    if not pending:
+        return 0
+    semaphore = asyncio.Semaphore(API_SAVE_CONCURRENCY)
+
+    async def save_one(bid: str) -> bool:
+        async with semaphore:
+            await wait_if_paused()
+            started = time.perf_counter()
+            ok = await api_save_card(page.context, template, bid)
+            record_phase("api_save", started, ok)
+            if ok and ledger is not None:
+                ledger_record(ledger, TILE_ID_PREFIX + bid, True, (time.perf_counter() - started) * 1000)
+            return ok
+
+    log(f"Сохраняю через API: {len(pending)} карточек (параллельно до {API_SAVE_CONCURRENCY})")
+    results = await asyncio.gather(*(save_one(bid) for bid in pending))
+    saved = 0
+    for bid, ok in zip(pending, results):
+        if ok:
+            seen_tile_ids.add(TILE_ID_PREFIX + bid)
+            saved += 1
+        else:
+            capture["failed"].add(bid)
+    count_card(stats, True, saved)
+    failed = len(pending) - saved
+    log(f"API: сохранено {saved}" + (f", {failed} — через интерфейс" if failed else ""))
+    return saved
+
+# Иконка звука внутри контейнера карточки
+TILE_ICON_SELECTOR = "svg.volume_mute_icon, [data-original-title*='звук' i], [data-original-title*='sound' i]"
+
+# ====== Журнал обработанных карточек (SQLite): продолжение после перезапуска ======
+LEDGER_PATH = os.getenv("LEDGER_PATH", os.path.join(os.path.dirname(STATE_PATH) or ".", "ledger.sqlite3"))
+# Окно «свежести»: карточки, сохранённые за последние N минут, пропускаются (0 — только в рамках текущего прохода)
+LEDGER_FRESH_MINUTES = float(os.getenv("LEDGER_FRESH_MINUTES", "0"))
+# Сколько id проверять одним запросом (ограничение SQLite на число параметров)
+LEDGER_QUERY_CHUNK = 500
+
+def open_ledger(profile_name: str, url: str) -> dict:
+    """Открывает журнал и начинает (или продолжает незавершённый) проход по папке из url."""
+    ledger = {"conn": None, "profile": profile_name, "folder": "", "pass_started": time.time()}
+    try:
+        d = os.path.dirname(LEDGER_PATH)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = sqlite3.connect(LEDGER_PATH)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cards ("
+            " profile TEXT NOT NULL, folder TEXT NOT NULL, broadcast_id TEXT NOT NULL,"
+            " last_saved_at REAL, last_attempt_at REAL NOT NULL, outcome TEXT NOT NULL, duration_ms REAL,"
+            " PRIMARY KEY (profile, folder, broadcast_id)) WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS passes ("
+            " profile TEXT NOT NULL, folder TEXT NOT NULL, started_at REAL NOT NULL, finished_at REAL,"
+            " PRIMARY KEY (profile, folder, started_at))"
+        )
+        conn.commit()
+        ledger["conn"] = conn
+    except Exception as e:
+        log(f"Журнал карточек недоступен ({e}) — работаю без него")
+    ledger_sync_folder(ledger, url)
+    return ledger
+
+def ledger_sync_folder(ledger: dict, url: str) -> None:
+    """Переключает журнал на папку из url; незавершённый проход по ней продолжается с места остановки."""
+    folder = folder_id_from_url(url)
+    if folder == ledger["folder"] and ledger.get("pass_loaded"):
+        return
+    ledger["folder"] = folder
+    ledger["pass_loaded"] = True
+    ledger["pass_started"] = time.time()
+    conn = ledger["conn"]
+    if conn is None:
+        return
+    try:
+        row = conn.execute(
+            "SELECT started_at FROM passes WHERE profile=? AND folder=? AND finished_at IS NULL"
+            " ORDER BY started_at DESC LIMIT 1",
+            (ledger["profile"], folder),
+        ).fetchone()
+        if row:
+            ledger["pass_started"] = row[0]
+            done = conn.execute(
+                "SELECT COUNT(*) FROM cards WHERE profile=? AND folder=? AND last_saved_at>=?",
+                (ledger["profile"], folder, row[0]),
+            ).fetchone()[0]
+            log(f"Продолжаю незавершённый проход по папке {folder or '—'}: уже сохранено {done}")
+        else:
+            conn.execute(
+                "INSERT INTO passes (profile, folder, started_at) VALUES (?, ?, ?)",
+                (ledger["profile"], folder, ledger["pass_started"]),
+            )
+            conn.commit()
+    except Exception:
+        pass
+
+def ledger_finish_pass(ledger: dict) -> None:
+    """Закрывает текущий проход и начинает новый."""
+    conn = ledger["conn"]
+    now = time.time()
+    if conn is not None:
+        try:
+            conn.execute(
+                "UPDATE passes SET finished_at=? WHERE profile=? AND folder=? AND started_at=?",
+                (now, ledger["profile"], ledger["folder"], ledger["pass_started"]),
+            )
+            conn.execute(
+                "INSERT INTO passes (profile, folder, started_at) VALUES (?, ?, ?)",
+                (ledger["profile"], ledger["folder"], now),
+            )
+            conn.commit()
+        except Exception:
+            pass
+    ledger["pass_started"] = now
+
+def ledger_fresh_tile_ids(ledger: dict, tile_ids: list[str]) -> set[str]:
+    """Из переданных плиток возвращает те, что уже сохранены в текущем проходе или в окне свежести."""
+    conn = ledger["conn"]
+    ids = [bid for bid in (broadcast_id_from_tile(t) for t in tile_ids) if bid]
+    if conn is None or not ids:
+        return set()
+    cutoff = ledger["pass_started"]
+    if LEDGER_FRESH_MINUTES > 0:
+        cutoff = min(cutoff, time.time() - LEDGER_FRESH_MINUTES * 60)
+    fresh: set[str] = set()
+    try:
+        for i in range(0, len(ids), LEDGER_QUERY_CHUNK):
+            chunk = ids[i:i + LEDGER_QUERY_CHUNK]
+            rows = conn.execute(
+                f"SELECT broadcast_id FROM cards WHERE profile=? AND folder=? AND last_saved_at>=?"
+                f" AND broadcast_id IN ({','.join('?' * len(chunk))})",
+                (ledger["profile"], ledger["folder"], cutoff, *chunk),
+            ).fetchall()
+            fresh.update(TILE_ID_PREFIX + r[0] for r in rows)
+    except Exception:
+        return set()
+    return fresh
+
+def ledger_record(ledger: dict, tile_id: str | None, ok: bool, duration_ms: float | None = None) -> None:
+    """Записывает результат обработки карточки (время последнего сохранения меняется только при успехе)."""
+    conn = ledger["conn"]
+    bid = broadcast_id_from_tile(tile_id)
+    if conn is None or not bid:
+        return
+    now = time.time()
+    try:
+        conn.execute(
+            "INSERT INTO cards (profile, folder, broadcast_id, last_saved_at, last_attempt_at, outcome, duration_ms)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (profile, folder, broadcast_id) DO UPDATE SET"
+            " last_saved_at=COALESCE(excluded.last_saved_at, cards.last_saved_at),"
+            " last_attempt_at=excluded.last_attempt_at, outcome=excluded.outcome, duration_ms=excluded.duration_ms",
+            (ledger["profile"], ledger["folder"], bid, now if ok else None, now, "saved" if ok else "error", duration_ms),
+        )
+        conn.commit()
+    except Exception:
+        pass
+
+def close_ledger(ledger: dict) -> None:
+    try:
+        if ledger["conn"] is not None:
+            ledger["conn"].close()
+    except Exception:
+        pass
+    ledger["conn"] = None
+
+# Снимок всех плиток сетки за один вызов в странице (вместо nth/get_attribute/inner_text на каждую)
+GRID_SNAPSHOT_JS = """
+(args) => {
+  const q = (root, sel) => { try { return root.querySelector(sel); } catch (e) { return null; } };
+  let tiles = [];
+  try { tiles = Array.from(document.querySelectorAll(args.tile)); } catch (e) { return []; }
+  const vw = window.innerWidth, vh = window.innerHeight;
+  return tiles.map((el, index) => {
+    const r = el.getBoundingClientRect();
+    const titleEl = q(el, args.title);
+    return {
+      index,
+      id: el.id || '',
+      title: titleEl ? (titleEl.innerText || '').trim() : '',
+      has_icon: !!q(el, args.icon),
+      box: {x: r.x, y: r.y, width: r.width, height: r.height},
+      in_viewport: r.width > 0 && r.height > 0 && r.bottom > 0 && r.top < vh && r.right > 0 && r.left < vw,
+    };
+  });
+}
+"""
+
+async def snapshot_grid(page) -> list[dict]:
+    """Инвентарь сетки: [{index, id, title, has_icon, box, in_viewport}] для всех отрисованных плиток."""
+    try:
+        return await page.evaluate(
+            GRID_SNAPSHOT_JS,
+            {"tile": TILE_CONTAINER_SELECTOR, "title": CARD_TITLE_SELECTOR, "icon": TILE_ICON_SELECTOR},
+        )
+    except Exception as e:
+        log(f"Не удалось снять список карточек: {e}")
+        return []
+
+def skip_fresh_tiles(ledger: dict, inventory: list[dict], seen_tile_ids: set[str]) -> None:
+    """Помечает как просмотренные плитки, которые журнал считает уже сохранёнными."""
+    candidates = [e["id"] for e in inventory if e["id"] and e["id"] not in seen_tile_ids]
+    fresh = ledger_fresh_tile_ids(ledger, candidates)
+    if fresh:
+        seen_tile_ids.update(fresh)
+        log(f"Пропускаю уже сохранённые по журналу: {len(fresh)}")
+
+def tile_locator(page, entry: dict):
+    """Локатор плитки из снимка: по id, а для плиток без id — по порядковому номеру."""
+    if entry.get("id"):
+        return page.locator(f'[id="{entry["id"]}"]').first
+    return page.locator(TILE_CONTAINER_SELECTOR).nth(entry["index"])
+
+# ====== Упреждающая подготовка следующих плиток ======
+# Пока текущая карточка сохраняется и закрывается, следующие PREFETCH_TILES плиток готовятся одним вызовом:
+# id, заголовок, координаты иконки; ближайшая подкручивается в видимую область (PREFETCH_SCROLL=0 — не крутить)
+PREFETCH_TILES = max(0, int(os.getenv("PREFETCH_TILES", "2")))
+PREFETCH_SCROLL = os.getenv("PREFETCH_SCROLL", "1") != "0"
+
+TILE_PREFETCH_JS = """
+(args) => {
+  const q = (root, sel) => { try { return root.querySelector(sel); } catch (e) { return null; } };
+  const vw = window.innerWidth, vh = window.innerHeight;
+  const inView = (r) => r.width > 0 && r.height > 0 && r.top >= 0 && r.left >= 0 && r.bottom <= vh && r.right <= vw;
+  return args.ids.map((id, n) => {
+    const el = document.getElementById(id);
+    if (!el) return {id, found: false};
+    const target = q(el, args.icon) || el;
+    let r = target.getBoundingClientRect();
+    let scrolled = false;
+    // Сетка под открытой карточкой: подкрутка минимальная (nearest) и только к ближайшей следующей плитке
+    if (n === 0 && args.scroll && !inView(r)) {
+      target.scrollIntoView({block: 'nearest', inline: 'nearest'});
+      r = target.getBoundingClientRect();
+      scrolled = true;
+    }
+    const titleEl = q(el, args.title);
+    return {
+      id,
+      found: true,
+      title: titleEl ? (titleEl.innerText || '').trim() : '',
+      has_icon: target !== el,
+      box: {x: r.x, y: r.y, width: r.width, height: r.height},
+      in_viewport: inView(r),
+      scrolled,
+    };
+  });
+}
+"""
+
+async def prefetch_tiles(page, tile_ids: list[str]) -> dict[str, dict]:
+    """Готовит плитки к открытию: id -> {title, has_icon, box, in_viewport, scrolled}."""
+    started = time.perf_counter()
+    try:
+        rows = await page.evaluate(
+            TILE_PREFETCH_JS,
+            {"ids": tile_ids, "icon": TILE_ICON_SELECTOR, "title": CARD_TITLE_SELECTOR, "scroll": PREFETCH_SCROLL},
+        )
+    except Exception:
+        record_phase("prefetch", started, False)
+        return {}
+    record_phase("prefetch", started)
+    return {row["id"]: row for row in rows if row.get("found")}
+
+def start_prefetch(page, prefetch: dict, tile_ids: list[str]) -> None:
+    """Запускает подготовку в фоне; предыдущая незавершённая подготовка отменяется."""
+    task = prefetch.get("task")
+    if task is not None and not task.done():
+        task.cancel()
+    prefetch["task"] = asyncio.ensure_future(prefetch_tiles(page, tile_ids)) if tile_ids else None
+
+async def take_prefetched(prefetch: dict, tile_id: str | None) -> dict | None:
+    """Подготовленная плитка (если подготовка успела и плитка найдена) или None — откроем обычным путём."""
+    task = prefetch.get("task")
+    prefetch["task"] = None
+    # Подготовка относится только к карточке, открытой сразу после неё: старые координаты не используем
+    try:
+        prefetch["ready"] = await task if task is not None else {}
+    except BaseException:
+        prefetch["ready"] = {}
+    if not tile_id:
+        return None
+    prepared = prefetch.get("ready", {}).pop(tile_id, None)
+    if prepared is not None:
+        prefetch["hits"] = prefetch.get("hits", 0) + 1
+    return prepared
+
+# ====== Прокрутка сетки (в т.ч. виртуализированной) ======
+# Сколько максимум ждать отрисовки новых плиток после шага прокрутки
+GRID_SETTLE_MS = 1500
+# Сетка без новых узлов и движения прокрутки столько мс считается дорисованной (не внизу списка)
+GRID_QUIET_MS = 250
+
+# Общая часть: находит реальный контейнер прокрутки (GRID_SCROLL_SELECTOR или ближайший прокручиваемый
+# предок плитки) и ждёт новые плитки через MutationObserver вместо фиксированных пауз
+GRID_SCROLL_JS_PRELUDE = """
+  const findScroller = () => {
+    // Запомненный контейнер берём, только пока он ещё прокручивается: сетка могла перестроиться,
+    // а документ, выбранный до того, как сетка переполнилась, ищем заново каждый раз
+    const marked = document.querySelector('[data-auto-bot-scroller]');
+    if (marked) {
+      if (marked !== document.scrollingElement && marked !== document.documentElement
+          && marked.scrollHeight > marked.clientHeight + 1) return marked;
+      marked.removeAttribute('data-auto-bot-scroller');
+    }
+    let el = null;
+    if (args.scroller) { try { el = document.querySelector(args.scroller); } catch (e) { el = null; } }
+    if (!el) {
+      const tile = document.querySelector(args.tile);
+      for (let p = tile && tile.parentElement; p; p = p.parentElement) {
+        const st = getComputedStyle(p);
+        if (/(auto|scroll|overlay)/.test(st.overflowY) && p.scrollHeight > p.clientHeight + 1) { el = p; break; }
+      }
+    }
+    el = el || document.scrollingElement || document.documentElement;
+    el.setAttribute('data-auto-bot-scroller', '1');
+    return el;
+  };
+  const el = findScroller();
+  const isDoc = el === document.scrollingElement || el === document.documentElement;
+  const viewH = isDoc ? window.innerHeight : el.clientHeight;
+  const tileIds = () => {
+    try { return new Set(Array.from(document.querySelectorAll(args.tile)).map((t) => t.id)); } catch (e) { return new Set(); }
+  };
+  const nearBottom = () => el.scrollTop + viewH >= el.scrollHeight - 2;
+  // Ждёт новые плитки до timeout; раньше выходит, если сетка успокоилась: прокрутка стоит и за args.quiet мс
+  // не добавилось ни одного узла. Внизу списка ждём весь timeout — там подгрузка может идти по сети
+  const waitForNewTiles = (before, timeout) => new Promise((resolve) => {
+    let timer = null, poll = null;
+    let lastTop = el.scrollTop, lastChange = performance.now();
+    const finish = (value) => { clearTimeout(timer); clearInterval(poll); obs.disconnect(); resolve(value); };
+    const obs = new MutationObserver((records) => {
+      if (records.some((r) => r.addedNodes.length)) lastChange = performance.now();
+      for (const id of tileIds()) {
+        if (!before.has(id)) { finish(true); return; }
+      }
+    });
+    obs.observe(isDoc ? document.body : el, {childList: true, subtree: true});
+    timer = setTimeout(() => finish(false), timeout);
+    if (args.quiet > 0) {
+      poll = setInterval(() => {
+        if (el.scrollTop !== lastTop) { lastTop = el.scrollTop; lastChange = performance.now(); return; }
+        if (!nearBottom() && performance.now() - lastChange >= args.quiet) finish(false);
+      }, 50);
+    }
+  });
+"""
+
+GRID_SCROLL_JS = "async (args) => {" + GRID_SCROLL_JS_PRELUDE + """
+  const before = tileIds();
+  let tileH = 0;
+  for (const t of document.querySelectorAll(args.tile)) {
+    const h = t.getBoundingClientRect().height;
+    if (h > 0) { tileH = h; break; }
+  }
+  // Шаг — почти экран, с перекрытием в один ряд, чтобы не пропустить плитки
+  const step = tileH > 0 ? Math.max(tileH, viewH - tileH) : args.fallback;
+  const prevTop = el.scrollTop, prevHeight = el.scrollHeight;
+  el.scrollBy(0, step);
+  const atBottom = nearBottom;
+  // Уже были внизу и не сдвинулись: событие scroll не придёт и подгрузку ничто не запустит —
+  // конец списка (если новых плиток нет), ждать таймаут незачем
+  if (el.scrollTop === prevTop && atBottom()) {
+    let fresh = 0;
+    tileIds().forEach((id) => { if (!before.has(id)) fresh += 1; });
+    return {fresh, step, tile_height: tileH, moved: false, end: fresh === 0};
+  }
+  // Наблюдатель ставим сразу после scrollBy: плитки дорисовываются в обработчиках scroll, то есть позже
+  const appeared = waitForNewTiles(before, args.timeout);
+  const gotNew = await appeared;
+  const after = tileIds();
+  let fresh = 0;
+  after.forEach((id) => { if (!before.has(id)) fresh += 1; });
+  return {
+    fresh,
+    step,
+    tile_height: tileH,
+    moved: el.scrollTop !== prevTop,
+    end: !gotNew && fresh === 0 && atBottom() && el.scrollHeight <= prevHeight,
+  };
+}"""
+
+GRID_SCROLL_TOP_JS = "async (args) => {" + GRID_SCROLL_JS_PRELUDE + """
+  if (el.scrollTop <= 0) return true;
+  const appeared = waitForNewTiles(tileIds(), args.timeout);
+  el.scrollTo(0, 0);
+  return await appeared;
+}"""
+
+def _grid_scroll_args() -> dict:
+    return {
+        "scroller": GRID_SCROLL_SELECTOR,
+        "tile": TILE_CONTAINER_SELECTOR,
+        "fallback": SCROLL_STEP,
+        "timeout": AD(GRID_SETTLE_MS),
+        "quiet": AD(GRID_QUIET_MS),
+    }
+
+async def scroll_grid(page) -> dict:
+    """Прокручивает контейнер сетки на шаг по высоте плиток и ждёт отрисовки новых.
+
+    Возвращает {fresh, step, tile_height, moved, end}; end=True — контейнер внизу и новых плиток не появилось.
+    """
+    try:
+        return await page.evaluate(GRID_SCROLL_JS, _grid_scroll_args())
+    except Exception as e:
+        log(f"Прокрутка сетки не удалась ({e}) — прокручиваю колесом")
+        await page.mouse.wheel(0, SCROLL_STEP)
+        await page.wait_for_timeout(AD(700))
+        return {"fresh": 0, "step": SCROLL_STEP, "tile_height": 0, "moved": True, "end": False}
+
+async def scroll_grid_to_top(page) -> None:
+    try:
+        await page.evaluate(GRID_SCROLL_TOP_JS, _grid_scroll_args())
+    except Exception:
+        try:
+            await page.evaluate("window.scrollTo(0,0)")
+        except Exception:
+            pass
+
+# Ожидание событий страницы: условие проверяется в самой странице при каждой мутации DOM,
+# без опроса из Python. Длинное ожидание режется на отрезки, чтобы пережить перезагрузку страницы
+PAGE_SIGNAL_SLICE_MS = 30000
+LOGOUT_TEXTS = ["log out", "выйти"]
+PAGE_SIGNAL_JS = """
+(args) => {
+  try { if (document.querySelector(args.icon)) return 'cards'; } catch (e) {}
+  if (args.logout.length) {
+    for (const el of document.querySelectorAll('a, button, [role="menuitem"], [role="button"]')) {
+      const t = (el.textContent || '').trim().toLowerCase();
+      if (t && args.logout.some((w) => t.includes(w))) return 'logged_in';
+    }
+  }
+  return false;
+}
+"""
+
+async def wait_for_page_signal(page, timeout_ms: float, logout: bool = False) -> str | None:
+    """Ждёт появления карточек (или, при logout=True, признака входа). Возвращает 'cards'/'logged_in' или None."""
+    try:
+        handle = await page.wait_for_function(
+            PAGE_SIGNAL_JS,
+            arg={"icon": ICON_SELECTOR, "logout": LOGOUT_TEXTS if logout else []},
+            polling="mutation",
+            timeout=max(1, int(timeout_ms)),
+        )
+        return await handle.json_value()
+    except Exception:
+        return None
+
+async def wait_until_cards(page) -> int:
+    """Ждёт появления карточек на странице. Возвращает их количество (0 — ждать больше нечего)."""
+    if WAIT_UNTIL_CARDS:
+        # режим ожидания, пока пользователь не откроет страницу с карточками
+        log("Карточек не видно — жду, пока вы откроете нужный раздел...")
+        started = time.time()
+        while True:
+            await wait_if_paused()
+            slice_ms = PAGE_SIGNAL_SLICE_MS
+            if MAX_WAIT_SECONDS > 0:
+                remaining_ms = MAX_WAIT_SECONDS * 1000 - (time.time() - started) * 1000
+                if remaining_ms <= 0:
+                    log("Истёк лимит ожидания карточек — выхожу")
+                    return 0
+                slice_ms = min(slice_ms, remaining_ms)
+            if await wait_for_page_signal(page, slice_ms):
+                count_icons = await page.locator(ICON_SELECTOR).count()
+                log(f"Появились карточки: {count_icons}")
+                return count_icons
+    # пробуем проскроллить, вдруг ленивый лоад
+    log("Карточек не видно — скроллю для подгрузки")
+    await scroll_grid(page)
+    count_icons = await page.locator(ICON_SELECTOR).count()
+    if count_icons == 0:
+        log("Новых карточек не появилось — завершаю обработку")
+    return count_icons
+
+async def process_all(page, workers: int | None = None, stats: dict | None = None):
+    workers = workers or WORKERS_STATE["value"]
+    stats = stats if stats is not None else profile_stats(current_profile_name())
+    capture = api_capture_for(current_profile_name())
+    attach_api_capture(page, capture)
+    ledger = open_ledger(current_profile_name(), page.url)
+    # Конвейер: следующая карточка открывается, как только закрылась предыдущая (PIPELINE_DEPTH=2)
+    gate = modal_gate() if PIPELINE_DEPTH > 1 else None
+    try:
+        if workers > 1:
+            await process_all_parallel(page, workers, stats, ledger)
+        else:
+            await process_sequential(page, stats, capture, ledger, gate)
+    finally:
+        drop_modal_gate(gate)
+        close_ledger(ledger)
+
+async def process_sequential(page, stats: dict, capture: dict, ledger: dict, gate: dict | None = None) -> None:
+    """Последовательная обработка: карточки открываются по очереди на одной вкладке."""
     processed = 0
+    passes = 0
     seen_titles: set[str] = set()
-    seen_tile_ids: set[str] = set()
-    while True:
-        # Пауза: не закрываемся, просто ждём
-        while STOP_FLAG["stop"]:
-            await page.wait_for_timeout(300)
-        count_icons = await page.locator(ICON_SELECTOR).count()
-        log(f"На странице найдено карточек (иконок): {count_icons}")
-        if count_icons == 0:
-            # режим ожидания, пока пользователь не откроет страницу с карточками
-            if WAIT_UNTIL_CARDS:
-                log("Карточек не видно — жду, пока вы откроете нужный раздел...")
-                started = time.time()
-                while True:
-                    while STOP_FLAG["stop"]:
-                        await page.wait_for_timeout(300)
-                    await page.wait_for_timeout(POLL_INTERVAL_MS)
-                    count_icons = await page.locator(ICON_SELECTOR).count()
-                    if count_icons > 0:
-                        log(f"Появились карточки: {count_icons}")
-                        break
-                    if MAX_WAIT_SECONDS > 0 and (time.time() - started) > MAX_WAIT_SECONDS:
-                        log("Истёк лимит ожидания карточек — выхожу")
-                        return
-                # продолжаем обычную обработку
-            else:
-                # пробуем проскроллить, вдруг ленивый лоад
-                log("Карточек не видно — скроллю для подгрузки")
-                await page.mouse.wheel(0, SCROLL_STEP)
-                await page.wait_for_timeout(500)
-                count_icons = await page.locator(ICON_SELECTOR).count()
-                if count_icons == 0:
-                    log("Новых карточек не появилось — завершаю обработку")
-                    break
+    seen_tile_ids: set[str] = set()
+    # Упреждающая подготовка: фоновая задача и готовые плитки (id -> координаты, заголовок)
+    prefetch: dict = {"task": None, "ready": {}, "hits": 0}
+    while True:
+        # Пауза: не закрываемся, просто ждём
+        await wait_if_paused()
+        # Снимок сетки и прокрутка — только без открытой карточки
+        await wait_modal_free(page, gate)
+        count_icons = await page.locator(ICON_SELECTOR).count()
+        log(f"На странице найдено карточек (иконок): {count_icons}")
+        if count_icons == 0:
+            count_icons = await wait_until_cards(page)
+            if count_icons == 0:
+                return
+            # продолжаем обычную обработку
+
+        # Снимок сетки одним вызовом: id, заголовок, наличие иконки и координаты каждой плитки
+        inventory = await snapshot_grid(page)
+        log(f"Найдено карточек (контейнеров): {len(inventory)}")
+        ledger_sync_folder(ledger, page.url)
+        skip_fresh_tiles(ledger, inventory, seen_tile_ids)
+
+        # В режиме API сначала сохраняем запросами всё известное (список папки + плитки из снимка)
+        if SAVE_MODE == "api" and capture.get("template"):
+            listing = capture["listing"].get(folder_id_from_url(page.url), set())
+            known_ids = [*sorted(listing), *(broadcast_id_from_tile(entry["id"]) for entry in inventory)]
+            processed += await api_save_pending(page, capture, known_ids, seen_tile_ids, stats, ledger)
 
         # Идём строго по карточкам-контейнерам, внутри каждого кликаем по иконке звука
-        tiles = page.locator(TILE_CONTAINER_SELECTOR)
-        tiles_count = await tiles.count()
-        log(f"Найдено карточек (контейнеров): {tiles_count}")
-
         opened_any = False
-        for i in range(tiles_count):
-            while STOP_FLAG["stop"]:
-                await page.wait_for_timeout(300)
-            tile = tiles.nth(i)
+        pending = [entry for entry in inventory if entry["has_icon"]]
+        for pos, entry in enumerate(pending):
+            await wait_if_paused()
             # стабильный уникальный id контейнера
-            tile_id = None
-            try:
-                tile_id = await tile.get_attribute("id")
-            except Exception:
-                tile_id = None
+            tile_id = entry["id"] or None
             if tile_id and tile_id in seen_tile_ids:
                 continue
 
             # заголовок карточки для доп. дедупликации
-            name = ""
-            try:
-                name = (await tile.locator(CARD_TITLE_SELECTOR).first.inner_text()).strip()
-            except Exception:
-                pass
+            name = entry["title"]
             if name and name.lower() in seen_titles:
                 continue
 
-            # иконка звука внутри контейнера
-            inner_icon = tile.locator("svg.volume_mute_icon, [data-original-title*='звук' i], [data-original-title*='sound' i]").first
+            # иконка звука внутри контейнера; плитка могла быть подготовлена, пока сохранялась предыдущая
+            prepared = await take_prefetched(prefetch, tile_id)
+            inner_icon = tile_locator(page, entry).locator(TILE_ICON_SELECTOR).first
+            upcoming = [
+                e["id"] for e in pending[pos + 1:]
+                if e["id"] and e["id"] not in seen_tile_ids
+            ][:PREFETCH_TILES]
+            i = entry["index"]
+            card_started = time.perf_counter()
             try:
-                await open_save_close(page, inner_icon, processed)
+                await open_save_close(
+                    page, inner_icon, processed, prepared,
+                    on_open=lambda upcoming=upcoming: start_prefetch(page, prefetch, upcoming),
+                    tile_id=tile_id,
+                    gate=gate,
+                )
+                ledger_record(ledger, tile_id, True, (time.perf_counter() - card_started) * 1000)
+                learn_save_template(capture, broadcast_id_from_tile(tile_id))
                 if tile_id:
                     seen_tile_ids.add(tile_id)
                 if name:
                     seen_titles.add(name.lower())
                 processed += 1
+                count_card(stats, True)
                 opened_any = True
             except Exception as e:
+                count_card(stats, False)
+                ledger_record(ledger, tile_id, False, (time.perf_counter() - card_started) * 1000)
                 log(f"❌ Ошибка при обработке контейнера #{i+1}: {e}")
                 continue
 
         if not opened_any:
-            # Если ничего не открыли: пытаемся подгрузить и начинаем новый цикл сначала
-            await page.mouse.wheel(0, SCROLL_STEP)
-            await page.wait_for_timeout(700)
-            # Если после скролла новые не появились — считаем, что дошли до конца; начинаем заново
-            new_count = await page.locator(ICON_SELECTOR).count()
-            if new_count == 0 or new_count == count_icons:
+            # Если ничего не открыли: прокручиваем контейнер сетки к следующим плиткам
+            await wait_modal_free(page, gate)
+            scrolled = await scroll_grid(page)
+            # Контейнер внизу и новых плиток нет — дошли до конца; начинаем заново
+            if scrolled["end"]:
+                passes += 1
+                ledger_finish_pass(ledger)
+                if PREFETCH_TILES and processed:
+                    log(f"Подготовлено заранее: {prefetch['hits']} из {processed} карточек")
+                if OPEN_PATH_STATS.get(current_profile_name()):
+                    log(f"Открытие карточек: {open_path_text(current_profile_name())}")
+                prefetch["hits"] = 0
+                if MAX_PASSES_STATE["value"] and passes >= MAX_PASSES_STATE["value"]:
+                    log(f"Похоже, конец списка. Выполнено проходов: {passes} — завершаю")
+                    return
                 log("Похоже, конец списка. Начинаю обход заново...")
                 # сбрасываем счётчики повторов на новый проход
                 processed = 0
                 seen_titles.clear()
                 seen_tile_ids.clear()
-                # Скроллим в самое начало страницы
-                try:
-                    await page.evaluate("window.scrollTo(0,0)")
-                except Exception:
-                    pass
-                await page.wait_for_timeout(600)
+                # Скроллим в самое начало списка
+                await scroll_grid_to_top(page)
                 continue
 
-async def main():
-    # Проверяем, доступен ли Playwright
-    if async_playwright is None:
-        log("Playwright не установлен — установите зависимости через scripts/run_bot.sh")
-        return
-    BOT_STATE["running"] = True
+# ====== Параллельная обработка (несколько вкладок в одном контексте) ======
+async def locate_tile(page, tile_id: str):
+    """Ищет контейнер карточки по id на вкладке воркера, при необходимости подскролливая сетку."""
+    tile = page.locator(f'[id="{tile_id}"]')
+    wrapped = False
+    for _attempt in range(WORKER_FIND_SCROLLS * 2):
+        try:
+            if await tile.count() > 0:
+                return tile.first
+        except Exception:
+            return None
+        scrolled = await scroll_grid(page)
+        if scrolled["end"]:
+            if wrapped:
+                return None
+            # Ниже не нашли — ищем заново с начала списка
+            wrapped = True
+            await scroll_grid_to_top(page)
+    return None
+
+def retry_tile(totals: dict, tile_id: str) -> bool:
+    """Возвращает неудавшуюся карточку в очередь повторов; False — попытки на этот проход исчерпаны."""
+    attempts = totals["attempts"].get(tile_id, 0) + 1
+    if attempts > WORKER_RETRIES:
+        return False
+    totals["attempts"][tile_id] = attempts
+    totals["retry"].append(tile_id)
+    return True
+
+async def card_worker(number: int, page, queue: asyncio.Queue, totals: dict, stats: dict, ledger: dict) -> None:
+    """Забирает id карточек из общей очереди и сохраняет их на своей вкладке."""
+    done = 0
+    started = time.time()
+    gate = modal_gate() if PIPELINE_DEPTH > 1 else None
     try:
-        async with async_playwright() as p:
-            log("Запускаю браузер Chromium (видимое окно)")
-            browser = await p.chromium.launch(headless=False)
-            context = None
+        while True:
+            # Авто‑темп мог снизить число активных воркеров — лишние не берут карточки, пока он их не разбудит
+            await wait_worker_slot(number, totals["workers"])
+            tile_id = await queue.get()
             try:
-                # Если заданы логин/пароль или включён FORCE_LOGIN — игнорируем сохранённую сессию
-                creds_present = bool(os.getenv(USERNAME_ENV)) and bool(os.getenv(PASSWORD_ENV))
-                force_login = os.getenv(FORCE_LOGIN_ENV, "0") != "0" or creds_present
-                use_saved_state = os.path.exists(STATE_PATH) and not force_login
-                context = await browser.new_context(
-                    storage_state=STATE_PATH if use_saved_state else None
-                )
-                if use_saved_state:
-                    log("Использую сохранённую сессию")
-                else:
-                    if force_login:
-                        log("Игнорирую сохранённую сессию: выполню авто‑логин с указанными данными")
+                if tile_id is None:
+                    await wait_modal_free(page, gate)
+                    return
+                await wait_if_paused()
+                tile = await locate_tile(page, tile_id)
+                if tile is None:
+                    if retry_tile(totals, tile_id):
+                        log(f"Воркер #{number}: карточка {tile_id} не найдена на вкладке — верну её в очередь")
                     else:
-                        log("Сохранённая сессия не найдена")
-                page = await context.new_page()
-                # Если ожидается логин — сразу идём на #/login, иначе на START_URL
-                login_hash_url = None
-                if force_login:
-                    parts = urlsplit(START_URL)
-                    base = parts.scheme + '://' + parts.netloc + (parts.path or '/')
-                    login_hash_url = base + '#/login'
+                        count_card(stats, False)
+                        log(f"Воркер #{number}: карточка {tile_id} не найдена на вкладке — пропускаю")
+                    continue
+                inner_icon = tile.locator(TILE_ICON_SELECTOR).first
+                card_started = time.perf_counter()
                 try:
-                    await page.goto(login_hash_url or START_URL, wait_until="domcontentloaded", timeout=TO(45000))
+                    await open_save_close(page, inner_icon, totals["processed"], tile_id=tile_id, gate=gate)
+                    ledger_record(ledger, tile_id, True, (time.perf_counter() - card_started) * 1000)
+                    learn_save_template(totals["capture"], broadcast_id_from_tile(tile_id))
+                    done += 1
+                    totals["processed"] += 1
+                    count_card(stats, True)
+                    elapsed = max(1.0, time.time() - started)
+                    log(f"Воркер #{number}: обработано {done}, ≈{int(done * 3600 / elapsed)} карточек/час")
                 except Exception as e:
-                    log(f"Переход на страницу не удался: {e}")
-                log(f"Открыл страницу: {login_hash_url or START_URL}")
+                    ledger_record(ledger, tile_id, False, (time.perf_counter() - card_started) * 1000)
+                    retried = retry_tile(totals, tile_id)
+                    if not retried:
+                        count_card(stats, False)
+                    log(f"❌ Ошибка в воркере #{number} ({tile_id}): {e}" + (" — верну её в очередь" if retried else ""))
+            finally:
+                queue.task_done()
+    finally:
+        # Воркер отменён (стоп, ошибка соседа) — хвост закрытия не должен пережить вкладку
+        drop_modal_gate(gate)
+
+async def process_all_parallel(page, workers: int, stats: dict, ledger: dict) -> None:
+    """Основная вкладка собирает id карточек в очередь, воркеры на своих вкладках их сохраняют."""
+    context = page.context
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    capture = api_capture_for(current_profile_name())
+    # retry — карточки, которые воркеры вернули после неудачи (attempts — сколько раз за проход)
+    totals = {"processed": 0, "capture": capture, "workers": workers, "retry": deque(), "attempts": {}}
+    worker_pages: list = []
+    tasks: list[asyncio.Task] = []
+    log(f"Параллельный режим: {workers} воркер(ов) в одном контексте браузера")
+    try:
+        for n in range(workers):
+            wpage = await context.new_page()
+            try:
+                await wpage.goto(page.url, wait_until="domcontentloaded", timeout=TO(45000))
+            except Exception as e:
+                log(f"Воркер #{n+1}: переход на страницу не удался: {e}")
+            attach_api_capture(wpage, capture)
+            worker_pages.append(wpage)
+            tasks.append(asyncio.create_task(card_worker(n + 1, wpage, queue, totals, stats, ledger)))
+
+        seen_titles: set[str] = set()
+        seen_tile_ids: set[str] = set()
+        passes = 0
+        pass_started = time.time()
+        while True:
+            await wait_if_paused()
+            count_icons = await page.locator(ICON_SELECTOR).count()
+            if count_icons == 0:
+                count_icons = await wait_until_cards(page)
+                if count_icons == 0:
+                    break
+
+            inventory = await snapshot_grid(page)
+            ledger_sync_folder(ledger, page.url)
+            skip_fresh_tiles(ledger, inventory, seen_tile_ids)
+            if SAVE_MODE == "api" and capture.get("template"):
+                listing = capture["listing"].get(folder_id_from_url(page.url), set())
+                known_ids = [*sorted(listing), *(broadcast_id_from_tile(entry["id"]) for entry in inventory)]
+                totals["processed"] += await api_save_pending(page, capture, known_ids, seen_tile_ids, stats, ledger)
+
+            queued_any = False
+            # Сначала — карточки, которые воркеры вернули после неудачи
+            while totals["retry"]:
+                await queue.put(totals["retry"].popleft())
+                queued_any = True
+            for entry in inventory:
+                tile_id = entry["id"]
+                if not tile_id or tile_id in seen_tile_ids or not entry["has_icon"]:
+                    continue
+                name = entry["title"]
+                if name and name.lower() in seen_titles:
+                    continue
+                seen_tile_ids.add(tile_id)
+                if name:
+                    seen_titles.add(name.lower())
+                await queue.put(tile_id)
+                queued_any = True
+
+            if not queued_any:
+                scrolled = await scroll_grid(page)
+                if scrolled["end"]:
+                    # Дожидаемся, пока воркеры разберут очередь, и начинаем новый проход
+                    await queue.join()
+                    if totals["retry"]:
+                        # Пока разбиралась очередь, часть карточек вернулась на повтор — проход не закончен
+                        continue
+                    ledger_finish_pass(ledger)
+                    elapsed = max(1.0, time.time() - pass_started)
+                    log(
+                        f"Проход завершён: {totals['processed']} карточек за {int(elapsed)} с "
+                        f"(≈{int(totals['processed'] * 3600 / elapsed)} карточек/час)"
+                    )
+                    if OPEN_PATH_STATS.get(current_profile_name()):
+                        log(f"Открытие карточек: {open_path_text(current_profile_name())}")
+                    passes += 1
+                    if MAX_PASSES_STATE["value"] and passes >= MAX_PASSES_STATE["value"]:
+                        log(f"Похоже, конец списка. Выполнено проходов: {passes} — завершаю")
+                        break
+                    log("Похоже, конец списка. Начинаю обход заново...")
+                    totals["processed"] = 0
+                    totals["attempts"].clear()
+                    seen_titles.clear()
+                    seen_tile_ids.clear()
+                    pass_started = time.time()
+                    await scroll_grid_to_top(page)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for wpage in worker_pages:
+            try:
+                await wpage.close()
+            except Exception:
+                pass
+
+# ====== Блокировка ненужных запросов (превью, шрифты, медиа, аналитика) ======
+# Типы ресурсов Playwright, которые не загружаются (пусто — не блокировать по типу)
+BLOCK_RESOURCE_TYPES = {t.strip() for t in os.getenv("BLOCK_RESOURCE_TYPES", "image,media,font").split(",") if t.strip()}
+# Подстроки URL, которые блокируются всегда (аналитика и счётчики)
+BLOCK_URL_PATTERNS = [
+    p.strip()
+    for p in os.getenv(
+        "BLOCK_URL_PATTERNS",
+        "google-analytics.com,googletagmanager.com,mc.yandex.ru,doubleclick.net,hotjar.com,facebook.net",
+    ).split(",")
+    if p.strip()
+]
+# Средний размер заблокированного ресурса (байт) — только для оценки сэкономленного трафика, не замер
+BLOCK_SIZE_ESTIMATES = {"image": 40_000, "media": 500_000, "font": 60_000}
+BLOCK_SIZE_DEFAULT = 15_000
+
+def block_route_pattern():
+    """Что перехватывает context.route: все запросы, если блокируем по типу ресурса (тип известен только
+    у самого запроса — превью и медиа CMS часто без расширения в URL), иначе — только шаблоны URL."""
+    if BLOCK_RESOURCE_TYPES:
+        return "**/*"
+    if BLOCK_URL_PATTERNS:
+        return re.compile("|".join(re.escape(p) for p in BLOCK_URL_PATTERNS))
+    return None
+
+async def install_request_blocking(context, profile: dict, stats: dict) -> None:
+    """Подключает context.route, отбрасывающий картинки/медиа/шрифты/аналитику; счётчики — в stats.
+
+    Любой route отключает HTTP‑кеш контекста, поэтому без BLOCK_RESOURCE_TYPES перехватываются только шаблоны URL.
+    """
+    pattern = block_route_pattern()
+    if pattern is None:
+        return
+    allow = [a.strip() for a in str(profile.get("allow", "")).split(",") if a.strip()]
+    stats.setdefault("blocked", 0)
+    stats.setdefault("blocked_bytes_est", 0)
+    stats.setdefault("blocked_by_type", {})
+
+    async def handle(route) -> None:
+        request = route.request
+        url = request.url
+        rtype = request.resource_type
+        blocked = (rtype in BLOCK_RESOURCE_TYPES or any(p in url for p in BLOCK_URL_PATTERNS)) and not any(
+            a in url for a in allow
+        )
+        if not blocked:
+            await route.continue_()
+            return
+        # Контекст переживает запуски — счётчики берём по имени профиля, а не из первого stats
+        current = PROFILE_STATS.get(profile.get("name", ""), stats)
+        current["blocked"] = current.get("blocked", 0) + 1
+        current["blocked_bytes_est"] = current.get("blocked_bytes_est", 0) + BLOCK_SIZE_ESTIMATES.get(rtype, BLOCK_SIZE_DEFAULT)
+        by_type = current.setdefault("blocked_by_type", {})
+        by_type[rtype] = by_type.get(rtype, 0) + 1
+        await route.abort()
+
+    try:
+        await context.route(pattern, handle)
+        log(
+            "Блокирую запросы: типы "
+            + (", ".join(sorted(BLOCK_RESOURCE_TYPES)) or "—")
+            + f"; шаблонов URL: {len(BLOCK_URL_PATTERNS)}"
+            + (f"; разрешено для профиля: {', '.join(allow)}" if allow else "")
+        )
+    except Exception as e:
+        log(f"Не удалось включить блокировку запросов: {e}")
+
+def blocking_summary(stats: dict) -> str:
+    if not stats.get("blocked"):
+        return ""
+    by_type = ", ".join(f"{k}: {v}" for k, v in sorted(stats.get("blocked_by_type", {}).items()))
+    return (
+        f"заблокировано {stats['blocked']} запросов "
+        f"(сэкономлено ≈{stats['blocked_bytes_est'] / 1_000_000:.1f} МБ по оценке; {by_type})"
+    )
+
+def profile_state_path(profile: dict) -> str:
+    """Файл сессии профиля: у каждого профиля своя сессия в var/states/."""
+    slug = re.sub(r"[^\w\-]+", "_", profile.get("name", "")).strip("_") or "profile"
+    base_dir = os.path.dirname(STATE_PATH) or "."
+    return os.path.join(base_dir, "states", f"{slug}.json")
+
+# ====== Хранилище сессий профилей ======
+# Лёгкий запрос, которым проверяется сохранённая сессия (пусто — GET ресурса из запомненного запроса сохранения)
+SESSION_CHECK_URL = os.getenv("SESSION_CHECK_URL", "").strip()
+# Запас до истечения cookie/токена, при котором сессия уже считается непригодной
+SESSION_EXPIRY_MARGIN_S = int(os.getenv("SESSION_EXPIRY_MARGIN_S", "300"))
+SESSION_CHECK_TIMEOUT_MS = 5000
+_AUTH_COOKIE_RE = re.compile(r"sess|token|auth|jwt|sid", re.IGNORECASE)
+_JWT_RE = re.compile(r"eyJ[\w-]+\.(eyJ[\w-]+)\.[\w-]+")
+
+def _jwt_expiry(value: str) -> float | None:
+    """exp из первого JWT в строке (без проверки подписи); None — токена нет."""
+    match = _JWT_RE.search(value or "")
+    if not match:
+        return None
+    try:
+        payload = match.group(1)
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except Exception:
+        return None
 
-                # Определяем, требуется ли логин (редирект на /login или видим форму логина)
-                login_required = force_login
+def check_session_offline(state_path: str) -> tuple[bool, str]:
+    """Проверка сохранённой сессии без сети: срок auth‑cookie и exp у JWT в cookie/localStorage."""
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return False, "файл сессии не найден"
+    except Exception as e:
+        return False, f"файл сессии не читается ({e})"
+    deadline = time.time() + SESSION_EXPIRY_MARGIN_S
+    cookies = state.get("cookies") or []
+    values = [(c.get("name", ""), str(c.get("value", ""))) for c in cookies]
+    for origin in state.get("origins") or []:
+        values.extend((item.get("name", ""), str(item.get("value", ""))) for item in origin.get("localStorage") or [])
+    if not values:
+        return False, "в сессии нет cookie и токенов"
+    for cookie in cookies:
+        expires = cookie.get("expires", -1)
+        if _AUTH_COOKIE_RE.search(cookie.get("name", "")) and expires and 0 < expires < deadline:
+            return False, f"истекает cookie {cookie.get('name')}"
+    for name, value in values:
+        exp = _jwt_expiry(value)
+        if exp is not None and exp < deadline:
+            return False, f"истёк токен {name}"
+    return True, ""
+
+async def check_session_online(context, profile: dict) -> bool | None:
+    """Один авторизованный запрос: True — сессия жива, False — сервер её отверг, None — проверить нечем."""
+    headers = {}
+    url = SESSION_CHECK_URL
+    template = api_capture_for(profile.get("name", "")).get("template")
+    if template:
+        headers = dict(template.get("headers") or {})
+        url = url or template.get("url", "")
+    if not url:
+        log("Онлайн‑проверки сессии нет: не задан SESSION_CHECK_URL и запрос сохранения ещё не запомнен")
+        return None
+    try:
+        response = await context.request.get(url, headers=headers, timeout=SESSION_CHECK_TIMEOUT_MS, max_redirects=0)
+    except Exception as e:
+        log(f"Проверка сессии не удалась: {e}")
+        return None
+    if response.status in (401, 403) or 300 <= response.status < 400:
+        return False
+    return True if response.ok else None
+
+def current_profile_from_env() -> dict[str, str]:
+    """Профиль из глобальных настроек (START_URL и переменные окружения SP_USERNAME/SP_PASSWORD)."""
+    return {
+        "name": ACTIVE_PROFILE_NAME["name"],
+        "url": START_URL,
+        "username": os.getenv(USERNAME_ENV, ""),
+        "password": os.getenv(PASSWORD_ENV, ""),
+    }
+
+async def open_profile_session(browser, profile: dict, stats: dict, state_path: str | None = None, interactive: bool = True):
+    """Новый BrowserContext профиля: сохранённая сессия, блокировка запросов, вход и переход на стартовую ссылку.
+
+    Возвращает (context, page) или None, если войти не удалось; при неудаче контекст закрывается.
+    """
+    start_url = profile.get("url") or START_URL
+    username = profile.get("username", "")
+    password = profile.get("password", "")
+    state_path = state_path or profile_state_path(profile)
+    context = None
+    opened = False
+    try:
+        # Сохранённую сессию профиля сначала проверяем офлайн (сроки cookie/токенов), затем одним запросом
+        creds_present = bool(username) and bool(password)
+        force_login = os.getenv(FORCE_LOGIN_ENV, "0") != "0"
+        session_ok, reason = (False, "включён FORCE_LOGIN") if force_login else check_session_offline(state_path)
+        use_saved_state = session_ok
+        context = await browser.new_context(
+            storage_state=state_path if use_saved_state else None
+        )
+        await install_request_blocking(context, profile, stats)
+        session_valid = None
+        if use_saved_state:
+            session_valid = await check_session_online(context, profile)
+            if session_valid is False:
+                log("Сервер не принял сохранённую сессию — войду заново")
+                use_saved_state = False
+                await context.clear_cookies()
+            elif session_valid:
+                log("Использую сохранённую сессию (проверена запросом)")
+            else:
+                log("Использую сохранённую сессию без онлайн‑проверки — проверю её по странице (редирект на логин, форма входа)")
+        else:
+            log(f"Сохранённая сессия не подходит: {reason}")
+        page = await context.new_page()
+        # Если ожидается логин — сразу идём на #/login, иначе на стартовую ссылку профиля
+        login_hash_url = None
+        if not use_saved_state and creds_present:
+            parts = urlsplit(start_url)
+            base = parts.scheme + '://' + parts.netloc + (parts.path or '/')
+            login_hash_url = base + '#/login'
+        try:
+            await page.goto(login_hash_url or start_url, wait_until="domcontentloaded", timeout=TO(45000))
+        except Exception as e:
+            log(f"Переход на страницу не удался: {e}")
+        log(f"Открыл страницу: {login_hash_url or start_url}")
+
+        # Определяем, требуется ли логин (редирект на /login или видим форму логина);
+        # сессию, подтверждённую запросом, не перепроверяем
+        login_required = not use_saved_state
+        if session_valid is None:
+            try:
+                await page.wait_for_load_state("networkidle", timeout=TO(1500))
+            except Exception:
+                pass
+        # Пауза до авторизации
+        await wait_if_paused()
+        if session_valid or login_required:
+            pass
+        else:
+            if "login" in page.url:
+                login_required = True
+            else:
                 try:
-                    await page.wait_for_load_state("networkidle", timeout=TO(1500))
+                    if await page.locator('input[type="password"]').count() > 0:
+                        login_required = True
                 except Exception:
                     pass
-                # Пауза до авторизации
-                while STOP_FLAG["stop"]:
-                    await page.wait_for_timeout(300)
-                if (not login_required) and ("login" in page.url):
-                    login_required = True
-                else:
-                    try:
-                        if await page.locator('input[type="password"]').count() > 0:
-                            login_required = True
-                    except Exception:
-                        pass
-
-                # Если нет сессии, запрошен принудительный вход или она невалидна — логинимся (сначала авто, затем вручную)
-                if (not use_saved_state) or login_required:
-                    auto_ok = await attempt_auto_login(page)
-                    if not auto_ok:
-                        log("Ожидаю ручной вход (до 10 минут)...")
-                        # Периодически проверяем, чтобы можно было остановить
-                        started = time.time()
-                        while True:
-                            while STOP_FLAG["stop"]:
-                                await page.wait_for_timeout(300)
-                            try:
-                                await page.locator('text=Log out, text=Выйти').first.wait_for(timeout=800)
-                                break
-                            except Exception:
-                                pass
-                            try:
-                                await page.locator(ICON_SELECTOR).first.wait_for(timeout=800)
-                                break
-                            except Exception:
-                                pass
-                            if (time.time() - started) * 1000 > LOGIN_WAIT_TIMEOUT:
-                                log("Не дождался ручного входа — завершаю")
-                                return
-                    # Сохраняем сессию и переходим к стартовой странице
-                    try:
-                        state_dir = os.path.dirname(STATE_PATH)
-                        if state_dir:
-                            os.makedirs(state_dir, exist_ok=True)
-                        await context.storage_state(path=STATE_PATH)
-                        log(f"Сессия сохранена: {STATE_PATH}")
-                    except Exception:
-                        pass
-                    while STOP_FLAG["stop"]:
-                        await page.wait_for_timeout(300)
-                    try:
-                        await page.goto(START_URL, wait_until="domcontentloaded", timeout=TO(45000))
-                    except Exception as e:
-                        log(f"Переход на стартовую страницу не удался: {e}")
-
-                # Основной цикл
-                try:
-                    await process_all(page)
-                except Exception as e:
-                    log(f"Ошибка в процессе обработки: {e}")
+            if login_required:
+                log("Страница требует входа — сохранённая сессия недействительна")
+            else:
+                log("Сохранённая сессия подтверждена страницей: без редиректа на логин и формы входа")
+
+        # Если нет сессии, запрошен принудительный вход или она невалидна — логинимся (сначала авто, затем вручную)
+        if (not use_saved_state) or login_required:
+            set_status(stats, "Вход")
+            auto_ok = await attempt_auto_login(page, username, password)
+            if not auto_ok and not interactive:
+                log("Авто‑логин не удался, а ручной вход без окна невозможен — завершаю")
+                set_status(stats, "Вход не выполнен")
+                return None
+            if not auto_ok:
+                set_status(stats, "Ожидает ручной вход")
+                log("Ожидаю ручной вход (до 10 минут)...")
+                # Ждём карточки или кнопку выхода событием в странице; отрезками — чтобы можно было остановить
+                started = time.time()
+                while True:
+                    await wait_if_paused()
+                    remaining_ms = LOGIN_WAIT_TIMEOUT - (time.time() - started) * 1000
+                    if remaining_ms <= 0:
+                        log("Не дождался ручного входа — завершаю")
+                        set_status(stats, "Вход не выполнен")
+                        return None
+                    if await wait_for_page_signal(page, min(PAGE_SIGNAL_SLICE_MS, remaining_ms), logout=True):
+                        break
+            # Сохраняем сессию и переходим к стартовой странице
+            try:
+                state_dir = os.path.dirname(state_path)
+                if state_dir:
+                    os.makedirs(state_dir, exist_ok=True)
+                await context.storage_state(path=state_path)
+                log(f"Сессия сохранена: {state_path}")
+            except Exception:
+                pass
+            await wait_if_paused()
+            try:
+                await page.goto(start_url, wait_until="domcontentloaded", timeout=TO(45000))
+            except Exception as e:
+                log(f"Переход на стартовую страницу не удался: {e}")
+        opened = True
+        return context, page
+    finally:
+        if context and not opened:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+async def process_profile_page(page, stats: dict) -> None:
+    """Основной цикл обработки на уже открытой и авторизованной странице профиля."""
+    set_status(stats, "Работает")
+    try:
+        await process_all(page, stats=stats)
+    except Exception as e:
+        log(f"Ошибка в процессе обработки: {e}")
+        set_status(stats, "Ошибка")
+        return
+    set_status(stats, "Завершён")
+
+async def run_profile(browser, profile: dict, state_path: str | None = None, interactive: bool = True) -> None:
+    """Полный цикл одного профиля в собственном изолированном BrowserContext: вход и обработка карточек.
+
+    interactive=False (headless) — не ждём ручного входа, если авто‑логин не удался.
+    """
+    stats = reset_profile_stats(profile.get("name", ""))
+    context = None
+    try:
+        session = await open_profile_session(browser, profile, stats, state_path, interactive)
+        if session is None:
+            return
+        context, page = session
+        await process_profile_page(page, stats)
+    except Exception as e:
+        set_status(stats, "Ошибка")
+        log(f"Ошибка профиля: {e}")
+    finally:
+        save_ranking(force=True)
+        flush_metrics(force=True)
+        if blocking_summary(stats):
+            log(f"Итого {blocking_summary(stats)}")
+        try:
+            if context:
+                await context.close()
+        except Exception:
+            pass
+
+async def main(profile: dict | None = None, headless: bool = False):
+    # Проверяем, доступен ли Playwright
+    if not load_playwright():
+        log("Playwright не установлен — установите зависимости через scripts/run_bot.sh")
+        return
+    set_running(True)
+    try:
+        async with async_playwright() as p:
+            log("Запускаю браузер Chromium (headless)" if headless else "Запускаю браузер Chromium (видимое окно)")
+            browser = await p.chromium.launch(headless=headless)
+            try:
+                await run_profile(browser, profile or current_profile_from_env(), interactive=not headless)
             finally:
                 # Закрываем браузер, если ещё открыт
                 try:
-                    if context:
-                        await context.close()
+                    await browser.close()
                 except Exception:
                     pass
+    finally:
+        set_running(False)
+
+async def main_fleet(profiles: list[dict], headless: bool = False) -> None:
+    """Флот: один Chromium, у каждого профиля свой BrowserContext, вход и обработка — одновременно."""
+    if not load_playwright():
+        log("Playwright не установлен — установите зависимости через scripts/run_bot.sh")
+        return
+    if not profiles:
+        log("Нет профилей для одновременного запуска")
+        return
+    set_running(True)
+    try:
+        async with async_playwright() as p:
+            log(f"Запускаю браузер Chromium для {len(profiles)} профилей")
+            browser = await p.chromium.launch(headless=headless)
+
+            async def run_tagged(prof: dict) -> None:
+                # Каждая задача получает свою копию контекста — префикс логов не смешивается
+                CURRENT_PROFILE.set(prof.get("name", ""))
+                await run_profile(browser, prof, profile_state_path(prof), interactive=not headless)
+
+            try:
+                await asyncio.gather(*(run_tagged(prof) for prof in profiles), return_exceptions=True)
+            finally:
                 try:
                     await browser.close()
                 except Exception:
                     pass
     finally:
-        BOT_STATE["running"] = False
+        set_running(False)
+
+# ====== Тёплый рантайм для панели управления ======
+# Один фоновый поток с собственным asyncio‑циклом держит Playwright и Chromium между нажатиями «Запустить».
+# Кнопки панели отправляют в него команды; контексты профилей после прогона не закрываются,
+# поэтому повторный запуск не запускает браузер и не логинится заново.
+RUNTIME: dict = {"loop": None, "thread": None, "playwright": None, "browser": None, "task": None, "sessions": {}}
+_RUNTIME_LOCK = Lock()
+
+def runtime_loop() -> asyncio.AbstractEventLoop:
+    """Цикл потока рантайма; поднимается при первой команде и живёт до закрытия окна."""
+    with _RUNTIME_LOCK:
+        loop = RUNTIME["loop"]
+        if loop is None or loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = Thread(target=loop.run_forever, name="auto-bot-runtime", daemon=True)
+            RUNTIME.update({"loop": loop, "thread": thread})
+            thread.start()
+            if not RUNTIME.get("atexit"):
+                # Выход не через окно (Ctrl+C, ошибка панели) — браузер и поток всё равно закрываются
+                atexit.register(runtime_shutdown)
+                RUNTIME["atexit"] = True
+        return loop
+
+def runtime_submit(coro):
+    """Передаёт корутину в поток рантайма; возвращает concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, runtime_loop())
+
+def session_key(profile: dict) -> tuple:
+    # Смена ссылки, логина, пароля или исключений блокировки требует нового контекста
+    return (profile.get("url") or START_URL, profile.get("username", ""), profile.get("password", ""), profile.get("allow", ""))
+
+async def runtime_browser():
+    """Тёплый Chromium; запускается заново, только если его ещё нет или окно браузера закрыли."""
+    browser = RUNTIME["browser"]
+    if browser is not None and browser.is_connected():
+        return browser
+    # Вместе с браузером пропали и все контексты профилей
+    RUNTIME["sessions"].clear()
+    if RUNTIME["playwright"] is None:
+        RUNTIME["playwright"] = await async_playwright().start()
+    log("Запускаю браузер Chromium (видимое окно, остаётся открытым между запусками)")
+    RUNTIME["browser"] = await RUNTIME["playwright"].chromium.launch(headless=False)
+    return RUNTIME["browser"]
+
+async def close_warm_session(name: str) -> None:
+    warm = RUNTIME["sessions"].pop(name, None)
+    if warm:
+        try:
+            await warm["context"].close()
+        except Exception:
+            pass
+
+async def warm_profile_page(browser, profile: dict, stats: dict, state_path: str):
+    """Страница профиля из тёплого контекста; новый контекст и вход — только при первом запуске или смене данных."""
+    name = profile.get("name", "")
+    start_url = profile.get("url") or START_URL
+    warm = RUNTIME["sessions"].get(name)
+    if warm and (warm["key"] != session_key(profile) or warm["page"].is_closed()):
+        await close_warm_session(name)
+        warm = None
+    if warm:
+        page = warm["page"]
+        # Прошлый прогон могли прервать посреди карточки — закрываем возможную модалку
+        await close_open_card(page)
+        try:
+            if page.url != start_url:
+                await page.goto(start_url, wait_until="domcontentloaded", timeout=TO(45000))
+            else:
+                await scroll_grid_to_top(page)
+        except Exception as e:
+            log(f"Переход на стартовую страницу не удался: {e}")
+        if "login" not in page.url:
+            log("Использую открытый контекст профиля — без перезапуска браузера и входа")
+            return page
+        log("Сессия открытого контекста истекла — открываю профиль заново")
+        await close_warm_session(name)
+    session = await open_profile_session(browser, profile, stats, state_path, interactive=True)
+    if session is None:
+        return None
+    context, page = session
+    RUNTIME["sessions"][name] = {"context": context, "page": page, "key": session_key(profile)}
+    return page
+
+async def run_warm_profile(browser, profile: dict, state_path: str) -> None:
+    """Как run_profile, но контекст профиля остаётся открытым для следующего запуска."""
+    stats = reset_profile_stats(profile.get("name", ""))
+    try:
+        page = await warm_profile_page(browser, profile, stats, state_path)
+        if page is None:
+            return
+        await process_profile_page(page, stats)
+    except asyncio.CancelledError:
+        set_status(stats, "Остановлен")
+        raise
+    except Exception as e:
+        set_status(stats, "Ошибка")
+        log(f"Ошибка профиля: {e}")
+    finally:
+        save_ranking(force=True)
+        flush_metrics(force=True)
+        if blocking_summary(stats):
+            log(f"Итого {blocking_summary(stats)}")
+
+async def runtime_run(profiles: list[dict], fleet: bool) -> None:
+    browser = await runtime_browser()
+
+    async def run_tagged(prof: dict) -> None:
+        CURRENT_PROFILE.set(prof.get("name", "") if fleet else "")
+        await run_warm_profile(browser, prof, profile_state_path(prof))
+
+    await asyncio.gather(*(run_tagged(prof) for prof in profiles), return_exceptions=True)
+
+async def _runtime_cancel() -> None:
+    task = RUNTIME["task"]
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except BaseException:
+            pass
+
+async def _runtime_start(profiles: list[dict], fleet: bool) -> None:
+    # Playwright грузится в потоке рантайма при первом запуске, окно при этом не замирает
+    if not load_playwright():
+        log("Playwright не установлен — установите зависимости через scripts/run_bot.sh")
+        if RUNTIME["task"] is None or RUNTIME["task"].done():
+            set_running(False)
+        return
+    # Переключение профиля: текущий прогон прерываем, его контекст остаётся тёплым
+    await _runtime_cancel()
+    task = asyncio.get_running_loop().create_task(runtime_run(profiles, fleet))
+    RUNTIME["task"] = task
+    set_running(True)
+
+    def on_done(done: asyncio.Task) -> None:
+        if RUNTIME["task"] is done:
+            set_running(False)
+        if not done.cancelled() and done.exception():
+            log(f"Ошибка рантайма: {done.exception()}")
+
+    task.add_done_callback(on_done)
+
+def runtime_start(profiles: list[dict], fleet: bool = False) -> None:
+    """Команда «Запустить»: профили обрабатываются в тёплом браузере; текущий прогон прерывается."""
+    set_running(True)
+    pace_reset(WORKERS_STATE["value"])
+    runtime_submit(_runtime_start(profiles, fleet))
+
+def runtime_pause(paused: bool) -> None:
+    """Команда «Пауза»/«Продолжить»: прерывает текущий шаг и мгновенно возобновляет работу."""
+    set_paused(paused)
+
+async def _runtime_shutdown() -> None:
+    await _runtime_cancel()
+    for name in list(RUNTIME["sessions"]):
+        await close_warm_session(name)
+    try:
+        if RUNTIME["browser"] is not None:
+            await RUNTIME["browser"].close()
+    except Exception:
+        pass
+    try:
+        if RUNTIME["playwright"] is not None:
+            await RUNTIME["playwright"].stop()
+    except Exception:
+        pass
+    RUNTIME.update({"browser": None, "playwright": None, "task": None})
+
+def runtime_shutdown(timeout: float = 5.0) -> None:
+    """Закрывает браузер и останавливает поток рантайма (при закрытии окна панели и при выходе из процесса)."""
+    loop, thread = RUNTIME["loop"], RUNTIME["thread"]
+    if loop is None or loop.is_closed() or thread is None or not thread.is_alive():
+        return
+    try:
+        runtime_submit(_runtime_shutdown()).result(timeout)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
+    if not thread.is_alive():
+        loop.close()
+    set_running(False)
 
 def run_control_panel_main_thread() -> None:
     """Графический интерфейс управления. Скруглённый UI на CustomTkinter, с фолбэком на ttk."""
@@ -952,6 +3236,7 @@ def run_control_panel_main_thread() -> None:
     try:
         import customtkinter as ctk  # type: ignore
         import tkinter as tk
+        startup_mark("customtkinter")
         # Стили
         ctk.set_appearance_mode("system")
         ctk.set_default_color_theme("blue")
@@ -963,9 +3248,9 @@ def run_control_panel_main_thread() -> None:
         except Exception:
             pass
         # Fixed window size (non-resizable)
-        root.geometry("960x560")
-        root.minsize(960, 560)
-        root.maxsize(960, 560)
+        root.geometry("960x660")
+        root.minsize(960, 660)
+        root.maxsize(960, 660)
         try:
             root.resizable(False, False)
         except Exception:
@@ -980,6 +3265,8 @@ def run_control_panel_main_thread() -> None:
         user_var = tk.StringVar()
         pwd_var = tk.StringVar()
         speed_var = tk.DoubleVar(value=SPEED_STATE["value"])  # type: ignore[assignment]
+        workers_var = tk.StringVar(value=str(WORKERS_STATE["value"]))
+        auto_var = tk.BooleanVar(value=PACE_STATE["enabled"])
         selected_name = tk.StringVar(value=PROFILES_STATE["profiles"][0]["name"] if PROFILES_STATE["profiles"] else "")
 
         # Left panel (rounded frame)
@@ -1019,19 +3306,35 @@ def run_control_panel_main_thread() -> None:
         pikachu_frame.grid_propagate(False)
         pikachu_label = ctk.CTkLabel(pikachu_frame, text="")
         pikachu_label.place(relx=0.5, rely=0.5, anchor="center")
-        # Try show first frame immediately or hint
-        try:
-            global _PIKACHU_FRAMES
-            if _PIKACHU_FRAMES is None:
-                _PIKACHU_FRAMES = _load_pikachu_frames()
-            if _PIKACHU_FRAMES:
-                pikachu_label.configure(image=_PIKACHU_FRAMES[0])
-                pikachu_label.image = _PIKACHU_FRAMES[0]
-            else:
-                hint = "Добавьте pikachu.gif в src/auto_bot/\nили укажите PIKACHU_GIF"
-                pikachu_label.configure(text=hint, justify="center", text_color="#7a7a7a")
-        except Exception:
-            pass
+
+        # GIF декодируется в фоне, когда панель с анимацией впервые показана, — окно доступно сразу
+        def show_first_pikachu_frame() -> None:
+            try:
+                if _PIKACHU_FRAMES:
+                    if not _PIKACHU_ANIMATING["on"]:
+                        pikachu_label.configure(image=_PIKACHU_FRAMES[0])
+                        pikachu_label.image = _PIKACHU_FRAMES[0]
+                else:
+                    hint = "Добавьте pikachu.gif в src/auto_bot/\nили укажите PIKACHU_GIF"
+                    pikachu_label.configure(text=hint, justify="center", text_color="#7a7a7a")
+            except Exception:
+                pass
+
+        def on_pikachu_map(_event=None) -> None:
+            pikachu_label.unbind("<Map>")
+            load_pikachu_frames_async(pikachu_label, show_first_pikachu_frame)
+
+        pikachu_label.bind("<Map>", on_pikachu_map)
+
+        # Свёрнутое или неактивное окно не анимируется; проверяем после обработки события, когда фокус уже перешёл
+        def update_panel_visibility() -> None:
+            try:
+                set_panel_visible(root.state() != "iconic" and bool(root.winfo_viewable()) and root.focus_displayof() is not None)
+            except Exception:
+                pass
+
+        for sequence in ("<Map>", "<Unmap>", "<FocusIn>", "<FocusOut>"):
+            root.bind(sequence, lambda _e: root.after_idle(update_panel_visibility), add="+")
 
         # Right panel (rounded frame)
         # Right panel
@@ -1077,38 +3380,86 @@ def run_control_panel_main_thread() -> None:
         speed_scale.grid(row=0, column=1, sticky="ew", padx=(12, 12))
         speed_value_lbl = ctk.CTkLabel(speed_row, text=f"{speed_var.get():.1f}")
         speed_value_lbl.grid(row=0, column=2, sticky="e")
+        # Количество параллельных воркеров (вкладок)
+        ctk.CTkLabel(speed_row, text="Потоки").grid(row=0, column=3, sticky="e", padx=(16, 6))
+        workers_menu = ctk.CTkOptionMenu(
+            speed_row,
+            variable=workers_var,
+            values=[str(n) for n in range(1, WORKERS_MAX + 1)],
+            width=64,
+            corner_radius=10,
+        )
+        workers_menu.grid(row=0, column=4, sticky="e")
+        # Авто‑темп: скорость и число воркеров подбираются сами, ползунок показывает выбранное значение
+        auto_check = ctk.CTkCheckBox(speed_row, text="Авто", variable=auto_var, width=60, corner_radius=6)
+        auto_check.grid(row=0, column=5, sticky="e", padx=(12, 0))
 
         # Estimated throughput row
         rate_row = ctk.CTkFrame(right, corner_radius=10, fg_color="transparent")
         rate_row.grid(row=5, column=0, columnspan=2, sticky="ew", padx=16, pady=(2, 8))
         rate_row.grid_columnconfigure(1, weight=1)
-        ctk.CTkLabel(rate_row, text="Оценка производительности").grid(row=0, column=0, sticky="w")
-        rate_value_lbl = ctk.CTkLabel(rate_row, text=f"{estimate_rate_per_hour()} трансляций/час")
+        ctk.CTkLabel(rate_row, text="Производительность").grid(row=0, column=0, sticky="w")
+        rate_value_lbl = ctk.CTkLabel(rate_row, text=measured_rate_text(ACTIVE_PROFILE_NAME["name"]))
         rate_value_lbl.grid(row=0, column=1, sticky="e")
+        pace_lbl = ctk.CTkLabel(rate_row, text="")
+        pace_lbl.grid(row=1, column=1, sticky="e")
 
         # Controls
         controls = ctk.CTkFrame(right, corner_radius=10, fg_color="transparent")
         controls.grid(row=7, column=0, columnspan=2, sticky="ew", padx=16, pady=(6, 0))
         controls.grid_columnconfigure(0, weight=1)
         controls.grid_columnconfigure(1, weight=1)
+        controls.grid_columnconfigure(2, weight=1)
         start_btn = ctk.CTkButton(controls, text="Запустить", corner_radius=10)
+        start_all_btn = ctk.CTkButton(controls, text="Запустить все", corner_radius=10)
         stop_btn = ctk.CTkButton(controls, text="Пауза", corner_radius=10, state="disabled")
         progress = ctk.CTkProgressBar(right)
         progress.grid(row=6, column=0, columnspan=2, sticky="ew", padx=16)
         progress.set(0)
         start_btn.grid(row=0, column=0, padx=(0, 8), pady=8, sticky="ew")
-        stop_btn.grid(row=0, column=1, padx=(8, 0), pady=8, sticky="ew")
+        start_all_btn.grid(row=0, column=1, padx=8, pady=8, sticky="ew")
+        stop_btn.grid(row=0, column=2, padx=(8, 0), pady=8, sticky="ew")
 
         # Status
         status_var = tk.StringVar(value="Выберите профиль, отредактируйте параметры и запустите")
         status = ctk.CTkLabel(right, textvariable=status_var, text_color=("#555555", "#aaaaaa"))
         status.grid(row=8, column=0, columnspan=2, sticky="w", padx=16, pady=(10, 6))
 
-        # Large status/log panel (latest log replaces previous)
-        log_box = ctk.CTkTextbox(right, height=200, corner_radius=12)
-        log_box.grid(row=9, column=0, columnspan=2, sticky="nsew", padx=16, pady=(6, 14))
+        # Log panel: scrollable, new lines appended in batches, oldest trimmed beyond LOG_VIEW_MAX_LINES
+        log_box = ctk.CTkTextbox(right, height=200, corner_radius=12, wrap="word")
+        log_box.grid(row=9, column=0, columnspan=2, sticky="nsew", padx=16, pady=(6, 8))
         log_box.configure(state="disabled")
 
+        # Fleet: status/throughput row per running profile
+        fleet_frame = ctk.CTkFrame(right, corner_radius=10, fg_color="transparent")
+        fleet_frame.grid(row=10, column=0, columnspan=2, sticky="ew", padx=16, pady=(0, 14))
+        fleet_frame.grid_columnconfigure(1, weight=1)
+        fleet_rows: dict[str, tuple] = {}
+
+        def build_fleet_rows(names: list[str]) -> None:
+            for child in fleet_frame.winfo_children():
+                child.destroy()
+            fleet_rows.clear()
+            for row_idx, name in enumerate(names):
+                name_lbl = ctk.CTkLabel(fleet_frame, text=name, font=("", 12, "bold"))
+                name_lbl.grid(row=row_idx, column=0, sticky="w", padx=(0, 12))
+                status_lbl = ctk.CTkLabel(fleet_frame, text="", text_color=("#555555", "#aaaaaa"))
+                status_lbl.grid(row=row_idx, column=1, sticky="w")
+                rate_lbl = ctk.CTkLabel(fleet_frame, text="")
+                rate_lbl.grid(row=row_idx, column=2, sticky="e")
+                fleet_rows[name] = (status_lbl, rate_lbl)
+                if name in PROFILE_STATS:
+                    refresh_fleet_row(name, PROFILE_STATS[name])
+
+        def refresh_fleet_row(name: str, stats: dict) -> None:
+            row = fleet_rows.get(name)
+            if not row:
+                return
+            status_lbl, rate_lbl = row
+            blocked = f" · {blocking_summary(stats)}" if stats.get("blocked") else ""
+            status_lbl.configure(text=f"{stats['status']} · обработано {stats['processed']}, ошибок {stats['errors']}{blocked}")
+            rate_lbl.configure(text=f"{stats_rate_per_hour(stats)} трансляций/час")
+
         # Helpers
         def refresh_profiles_menu(select_name: str | None = None) -> None:
             names = profiles_names()
@@ -1117,12 +3468,31 @@ def run_control_panel_main_thread() -> None:
             if name:
                 selected_name.set(name)
 
+        fields_loading = {"active": False}
+
         def load_profile_into_fields(name: str) -> None:
             profiles = PROFILES_STATE["profiles"]
             prof = next((p for p in profiles if p["name"] == name), profiles[0] if profiles else {"url": "", "username": "", "password": ""})
-            url_var.set(prof.get("url", ""))
-            user_var.set(prof.get("username", ""))
-            pwd_var.set(prof.get("password", ""))
+            fields_loading["active"] = True
+            try:
+                url_var.set(prof.get("url", ""))
+                user_var.set(prof.get("username", ""))
+                pwd_var.set(prof.get("password", ""))
+            finally:
+                fields_loading["active"] = False
+
+        def on_field_change(*_args) -> None:
+            """Правка поля сразу попадает в профиль; запись на диск — отложенная, в фоне."""
+            if fields_loading["active"]:
+                return
+            try:
+                if update_profile_fields(selected_name.get(), url_var.get(), user_var.get(), pwd_var.get()):
+                    schedule_profiles_save()
+            except Exception:
+                pass
+
+        for var in (url_var, user_var, pwd_var):
+            var.trace_add("write", on_field_change)
 
         def on_profile_select(_value: str) -> None:
             try:
@@ -1208,8 +3578,8 @@ def run_control_panel_main_thread() -> None:
                 widget.bind_all("<Command-r>", lambda _e: on_start())
                 widget.bind_all("<Control-r>", lambda _e: on_start())
                 widget.bind_all("<space>", lambda _e: on_stop())
-                widget.bind_all("<Command-s>", lambda _e: save_profiles(PROFILES_STATE["profiles"]))
-                widget.bind_all("<Control-s>", lambda _e: save_profiles(PROFILES_STATE["profiles"]))
+                widget.bind_all("<Command-s>", lambda _e: schedule_profiles_save(delay=0))
+                widget.bind_all("<Control-s>", lambda _e: schedule_profiles_save(delay=0))
                 widget.bind_all("<Up>", lambda _e: profiles_menu.set(profiles_names()[max(0, profiles_names().index(selected_name.get()) - 1)]) if profiles_names() else None)
                 widget.bind_all("<Down>", lambda _e: profiles_menu.set(profiles_names()[min(len(profiles_names()) - 1, profiles_names().index(selected_name.get()) + 1)]) if profiles_names() else None)
             except Exception:
@@ -1222,22 +3592,38 @@ def run_control_panel_main_thread() -> None:
             try:
                 SPEED_STATE["value"] = float(speed_var.get() or 1.0)
                 speed_value_lbl.configure(text=f"{SPEED_STATE['value']:.1f}")
-                rate_value_lbl.configure(text=f"{estimate_rate_per_hour()} трансляций/час")
             except Exception:
                 pass
         speed_scale.configure(command=on_speed_change)
 
+        def on_auto_toggle() -> None:
+            PACE_STATE["enabled"] = bool(auto_var.get())
+            if PACE_STATE["enabled"]:
+                pace_reset(WORKERS_STATE["value"])
+            else:
+                pace_wake()
+            apply_pace()
+        auto_check.configure(command=on_auto_toggle)
+
         def on_start() -> None:
             try:
                 SPEED_STATE["value"] = float(speed_var.get() or 1.0)
             except Exception:
                 SPEED_STATE["value"] = 1.0
-            STOP_FLAG["stop"] = False
+            try:
+                WORKERS_STATE["value"] = max(1, min(WORKERS_MAX, int(workers_var.get())))
+            except Exception:
+                WORKERS_STATE["value"] = 1
+            set_paused(False)
             ACTIVE_PROFILE_NAME["name"] = selected_name.get()
-            os.environ["SP_USERNAME"] = user_var.get().strip()
-            os.environ["SP_PASSWORD"] = pwd_var.get().strip()
-            global START_URL
-            START_URL = url_var.get().strip() or START_URL
+            profile = {
+                "name": selected_name.get(),
+                "url": url_var.get().strip() or START_URL,
+                "username": user_var.get().strip(),
+                "password": pwd_var.get().strip(),
+                "allow": next((p.get("allow", "") for p in PROFILES_STATE["profiles"] if p["name"] == selected_name.get()), ""),
+            }
+            build_fleet_rows([profile["name"]])
             status_var.set("Запущено… окно можно оставить открытым и менять скорость")
             start_btn.configure(state="disabled")
             stop_btn.configure(state="normal", text="Пауза")
@@ -1251,27 +3637,42 @@ def run_control_panel_main_thread() -> None:
                 start_pikachu_animation(pikachu_label)
             except Exception:
                 pass
-            os.environ[FORCE_LOGIN_ENV] = "1" if (os.environ.get("SP_USERNAME") or os.environ.get("SP_PASSWORD")) else "0"
-            Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+            runtime_start([profile])
 
-        def on_stop() -> None:
-            if STOP_FLAG["stop"]:
-                STOP_FLAG["stop"] = False
-                status_var.set("Продолжаю…")
-                stop_btn.configure(text="Пауза")
-            else:
-                STOP_FLAG["stop"] = True
-                status_var.set("Пауза")
-                stop_btn.configure(text="Продолжить")
+        def on_start_all() -> None:
             try:
-                if STOP_FLAG["stop"]:
-                    stop_pikachu_animation()
-                else:
-                    start_pikachu_animation(pikachu_label)
+                SPEED_STATE["value"] = float(speed_var.get() or 1.0)
+            except Exception:
+                SPEED_STATE["value"] = 1.0
+            try:
+                WORKERS_STATE["value"] = max(1, min(WORKERS_MAX, int(workers_var.get())))
+            except Exception:
+                WORKERS_STATE["value"] = 1
+            fleet = [dict(p) for p in PROFILES_STATE["profiles"] if p.get("url")]
+            if not fleet:
+                status_var.set("Нет профилей со ссылкой для запуска")
+                return
+            set_paused(False)
+            PROFILE_STATS.clear()
+            for prof in fleet:
+                profile_stats(prof["name"])
+            build_fleet_rows([prof["name"] for prof in fleet])
+            status_var.set(f"Запущено профилей: {len(fleet)}")
+            start_btn.configure(state="disabled")
+            start_all_btn.configure(state="disabled")
+            stop_btn.configure(state="normal", text="Пауза")
+            try:
+                start_pikachu_animation(pikachu_label)
             except Exception:
                 pass
+            runtime_start(fleet, fleet=True)
+
+        def on_stop() -> None:
+            # Кнопки, статус и анимацию обновит apply_run_state по событию "paused"
+            runtime_pause(not STOP_FLAG["stop"])
 
         start_btn.configure(command=on_start)
+        start_all_btn.configure(command=on_start_all)
         stop_btn.configure(command=on_stop)
 
         # Initialize (restore UI state)
@@ -1280,35 +3681,35 @@ def run_control_panel_main_thread() -> None:
         refresh_profiles_menu()
         if saved.get("selected_profile"):
             selected_name.set(saved["selected_profile"]) 
+        if saved.get("workers"):
+            workers_var.set(str(saved["workers"]))
+        if "auto_speed" in saved:
+            auto_var.set(bool(saved["auto_speed"]))
+            PACE_STATE["enabled"] = bool(saved["auto_speed"])
         if selected_name.get():
             load_profile_into_fields(selected_name.get())
-        did_initial_load = {"done": True}
-
-        def poll() -> None:
-            # Buttons state
-            if BOT_STATE["running"]:
-                status_var.set("Работает… можно менять скорость или нажать Пауза")
-                stop_btn.configure(state="normal")
-                start_btn.configure(state="disabled")
-                try:
+        def apply_run_state() -> None:
+            """Кнопки, статус, прогресс и анимация — по текущим running/paused."""
+            try:
+                if BOT_STATE["running"]:
+                    paused = STOP_FLAG["stop"]
+                    status_var.set("Пауза" if paused else "Работает… можно менять скорость или нажать Пауза")
+                    stop_btn.configure(state="normal", text="Продолжить" if paused else "Пауза")
+                    # Другой профиль можно запустить сразу: текущий прогон прервётся, браузер останется открытым
+                    start_btn.configure(state="normal" if selected_name.get() != ACTIVE_PROFILE_NAME["name"] else "disabled")
+                    start_all_btn.configure(state="disabled")
                     progress.configure(mode="indeterminate")
                     progress.start()
-                except Exception:
-                    pass
-            else:
-                if STOP_FLAG["stop"]:
-                    status_var.set("Остановлено")
                 else:
-                    status_var.set("Готов к запуску")
-                start_btn.configure(state="normal")
-                stop_btn.configure(state="disabled")
-                try:
+                    status_var.set("Остановлено" if STOP_FLAG["stop"] else "Готов к запуску")
+                    start_btn.configure(state="normal")
+                    start_all_btn.configure(state="normal")
+                    stop_btn.configure(state="disabled", text="Пауза")
                     progress.stop()
                     progress.set(0)
                     progress.configure(mode="determinate")
-                except Exception:
-                    pass
-            # Animate pikachu according to state
+            except Exception:
+                pass
             try:
                 if BOT_STATE["running"] and not STOP_FLAG["stop"]:
                     start_pikachu_animation(pikachu_label)
@@ -1316,59 +3717,72 @@ def run_control_panel_main_thread() -> None:
                     stop_pikachu_animation()
             except Exception:
                 pass
-            # Auto-save current fields into selected profile (safe, without wiping non-empty values to empty)
+
+        def apply_pace() -> None:
+            # авто‑темп: ползунок и подпись следуют за выбранной контроллером скоростью
+            if PACE_STATE["enabled"]:
+                speed_var.set(SPEED_STATE["value"])
+                speed_value_lbl.configure(text=f"{SPEED_STATE['value']:.1f}")
+                pace_lbl.configure(text=f"Авто: {pace_summary()}")
+            else:
+                pace_lbl.configure(text="")
+
+        def append_log_lines(lines: list[str]) -> None:
+            try:
+                at_bottom = log_box.yview()[1] >= 0.999
+                log_box.configure(state="normal")
+                log_box.insert("end", "\n".join(lines) + "\n")
+                excess = int(log_box.index("end-1c").split(".")[0]) - 1 - LOG_VIEW_MAX_LINES
+                if excess > 0:
+                    log_box.delete("1.0", f"{excess + 1}.0")
+                log_box.configure(state="disabled")
+                # Не сбиваем прокрутку, если пользователь читает старые строки
+                if at_bottom:
+                    log_box.see("end")
+            except Exception:
+                pass
+
+        def pump() -> None:
+            """Забирает изменения шины и строки лога пачкой и обновляет только затронутые виджеты."""
             try:
-                name = selected_name.get()
-                for p in PROFILES_STATE["profiles"]:
-                    if p["name"] == name:
-                        current_url = url_var.get().strip()
-                        current_user = user_var.get().strip()
-                        current_pwd = pwd_var.get().strip()
-                        # Не перезаписываем заполненные значения пустыми
-                        all_empty = not current_url and not current_user and not current_pwd
-                        changed = (
-                            current_url != p.get("url", "") or
-                            current_user != p.get("username", "") or
-                            current_pwd != p.get("password", "")
-                        )
-                        if did_initial_load.get("done") and changed and (not all_empty or not (p.get("url") or p.get("username") or p.get("password"))):
-                            p["url"] = current_url
-                            p["username"] = current_user
-                            p["password"] = current_pwd
-                            save_profiles(PROFILES_STATE["profiles"])
-                        break
-                # keep rate in sync if something changed speed externally
-                rate_value_lbl.configure(text=f"{estimate_rate_per_hour()} трансляций/час")
-                # drain log queue and show last line only in the big textbox
-                last_msg = None
-                try:
-                    while True:
-                        last_msg = LOG_QUEUE.get_nowait()
-                except Empty:
-                    pass
-                if last_msg is not None:
-                    try:
-                        log_box.configure(state="normal")
-                        log_box.delete("1.0", "end")
-                        log_box.insert("end", last_msg)
-                        log_box.configure(state="disabled")
-                    except Exception:
-                        pass
+                changes = drain_bus()
+                if "running" in changes or "paused" in changes:
+                    apply_run_state()
+                for topic, stats in changes.items():
+                    if topic.startswith("stats:"):
+                        name = topic[len("stats:"):]
+                        refresh_fleet_row(name, stats)
+                        if name == ACTIVE_PROFILE_NAME["name"]:
+                            # производительность по замерам текущего (или последнего) запуска
+                            rate_value_lbl.configure(text=measured_rate_text(name))
+                if "pace" in changes:
+                    apply_pace()
+                lines = drain_log_lines()
+                if lines:
+                    append_log_lines(lines)
             except Exception:
                 pass
-            root.after(400, poll)
+            root.after(UI_PUMP_MS if PANEL_VIEW["visible"] else UI_PUMP_HIDDEN_MS, pump)
 
-        poll()
+        selected_name.trace_add("write", lambda *_a: apply_run_state() if BOT_STATE["running"] else None)
+        apply_run_state()
+        apply_pace()
+        rate_value_lbl.configure(text=measured_rate_text(ACTIVE_PROFILE_NAME["name"]))
+        pump()
 
         def persist_ui_state():
             try:
                 save_ui_state({
                     "selected_profile": selected_name.get(),
+                    "workers": workers_var.get(),
+                    "auto_speed": bool(auto_var.get()),
                 })
             except Exception:
                 pass
 
-        root.protocol("WM_DELETE_WINDOW", lambda: (persist_ui_state(), root.destroy()))
+        root.protocol("WM_DELETE_WINDOW", lambda: (persist_ui_state(), flush_profiles_save(), runtime_shutdown(), root.destroy()))
+        startup_mark("panel")
+        root.after_idle(log_startup_report)
         root.mainloop()
         return
     except ImportError:
@@ -1386,7 +3800,7 @@ def run_control_panel_main_thread() -> None:
             root.iconify(); root.update(); root.deiconify()
         except Exception:
             pass
-        root.minsize(780, 360)
+        root.minsize(780, 480)
         root.rowconfigure(0, weight=1)
         root.columnconfigure(0, weight=0)
         root.columnconfigure(1, weight=1)
@@ -1405,6 +3819,8 @@ def run_control_panel_main_thread() -> None:
         user_var = tk.StringVar()
         pwd_var = tk.StringVar()
         speed_var = tk.DoubleVar(value=SPEED_STATE["value"])
+        workers_var = tk.StringVar(value=str(WORKERS_STATE["value"]))
+        auto_var = tk.BooleanVar(value=PACE_STATE["enabled"])
         selected_name = tk.StringVar(value=PROFILES_STATE["profiles"][0]["name"] if PROFILES_STATE["profiles"] else "")
 
         left = ttk.Frame(root, padding=(10, 10, 6, 10))
@@ -1428,9 +3844,9 @@ def run_control_panel_main_thread() -> None:
 
         right = ttk.Frame(root, padding=(6, 10, 10, 10))
         right.grid(row=0, column=1, sticky="nsew")
-        for i in range(6):
+        for i in range(8):
             right.rowconfigure(i, weight=0)
-        right.rowconfigure(6, weight=1)
+        right.rowconfigure(8, weight=1)
         right.columnconfigure(1, weight=1)
 
         ttk.Label(right, text="Детали профиля", font=("", 11, "bold")).grid(row=0, column=0, columnspan=2, sticky="w")
@@ -1454,17 +3870,52 @@ def run_control_panel_main_thread() -> None:
         speed_scale = ttk.Scale(speed_row, from_=0.2, to=3.0, orient="horizontal", variable=speed_var, length=360)
         speed_scale.grid(row=0, column=2, sticky="ew")
         speed_row.columnconfigure(2, weight=1)
+        ttk.Label(speed_row, text="Потоки").grid(row=0, column=3, sticky="e", padx=(10, 4))
+        workers_spin = ttk.Spinbox(speed_row, from_=1, to=WORKERS_MAX, textvariable=workers_var, width=4)
+        workers_spin.grid(row=0, column=4, sticky="e")
+        auto_check = ttk.Checkbutton(speed_row, text="Авто", variable=auto_var)
+        auto_check.grid(row=0, column=5, sticky="e", padx=(10, 0))
 
         controls = ttk.Frame(right)
         controls.grid(row=5, column=0, columnspan=2, sticky="w", pady=(10, 0))
         start_btn = ttk.Button(controls, text="Запустить")
+        start_all_btn = ttk.Button(controls, text="Запустить все")
         stop_btn = ttk.Button(controls, text="Пауза", state="disabled")
         start_btn.grid(row=0, column=0, padx=(0, 8))
-        stop_btn.grid(row=0, column=1)
+        start_all_btn.grid(row=0, column=1, padx=(0, 8))
+        stop_btn.grid(row=0, column=2)
 
         status_var = tk.StringVar(value="Выберите профиль слева, отредактируйте параметры и запустите")
         status = ttk.Label(right, textvariable=status_var, foreground="#555")
         status.grid(row=6, column=0, columnspan=2, sticky="w", pady=(14, 0))
+        fleet_var = tk.StringVar(value="")
+        fleet_lbl = ttk.Label(right, textvariable=fleet_var, justify="left")
+        fleet_lbl.grid(row=7, column=0, columnspan=2, sticky="nw", pady=(8, 0))
+
+        # Лог: как в CTk‑панели — строки пачками из LOG_QUEUE, старше LOG_VIEW_MAX_LINES обрезаются
+        log_frame = ttk.Frame(right)
+        log_frame.grid(row=8, column=0, columnspan=2, sticky="nsew", pady=(8, 0))
+        log_frame.rowconfigure(0, weight=1)
+        log_frame.columnconfigure(0, weight=1)
+        log_box = tk.Text(log_frame, height=10, wrap="word", state="disabled")
+        log_scroll = ttk.Scrollbar(log_frame, orient="vertical", command=log_box.yview)
+        log_box.configure(yscrollcommand=log_scroll.set)
+        log_box.grid(row=0, column=0, sticky="nsew")
+        log_scroll.grid(row=0, column=1, sticky="ns")
+
+        def append_log_lines(lines):
+            try:
+                at_bottom = log_box.yview()[1] >= 0.999
+                log_box.configure(state="normal")
+                log_box.insert("end", "\n".join(lines) + "\n")
+                excess = int(log_box.index("end-1c").split(".")[0]) - 1 - LOG_VIEW_MAX_LINES
+                if excess > 0:
+                    log_box.delete("1.0", f"{excess + 1}.0")
+                log_box.configure(state="disabled")
+                if at_bottom:
+                    log_box.see("end")
+            except Exception:
+                pass
 
         def refresh_profile_listbox(select_name: str | None = None) -> None:
             profiles_listbox.delete(0, tk.END)
@@ -1481,12 +3932,30 @@ def run_control_panel_main_thread() -> None:
                         selected_name.set(name)
                         break
 
+        fields_loading = {"active": False}
+
         def load_profile_into_fields(name: str) -> None:
             profiles = PROFILES_STATE["profiles"]
             prof = next((p for p in profiles if p["name"] == name), profiles[0] if profiles else {"url": "", "username": "", "password": ""})
-            url_var.set(prof.get("url", ""))
-            user_var.set(prof.get("username", ""))
-            pwd_var.set(prof.get("password", ""))
+            fields_loading["active"] = True
+            try:
+                url_var.set(prof.get("url", ""))
+                user_var.set(prof.get("username", ""))
+                pwd_var.set(prof.get("password", ""))
+            finally:
+                fields_loading["active"] = False
+
+        def on_field_change(*_args):
+            if fields_loading["active"]:
+                return
+            try:
+                if update_profile_fields(selected_name.get(), url_var.get(), user_var.get(), pwd_var.get()):
+                    schedule_profiles_save()
+            except Exception:
+                pass
+
+        for var in (url_var, user_var, pwd_var):
+            var.trace_add("write", on_field_change)
 
         def on_profile_select(_evt=None):
             try:
@@ -1571,67 +4040,111 @@ def run_control_panel_main_thread() -> None:
                 pass
         speed_scale.configure(command=lambda v: on_speed_change())
 
+        def on_auto_toggle():
+            PACE_STATE["enabled"] = bool(auto_var.get())
+            if PACE_STATE["enabled"]:
+                pace_reset(WORKERS_STATE["value"])
+            else:
+                pace_wake()
+            refresh_fleet_text()
+        auto_check.configure(command=on_auto_toggle)
+
         def on_start():
             try:
                 SPEED_STATE["value"] = float(speed_var.get() or 1.0)
             except Exception:
                 SPEED_STATE["value"] = 1.0
-            STOP_FLAG["stop"] = False
+            try:
+                WORKERS_STATE["value"] = max(1, min(WORKERS_MAX, int(workers_var.get())))
+            except Exception:
+                WORKERS_STATE["value"] = 1
+            set_paused(False)
             ACTIVE_PROFILE_NAME["name"] = selected_name.get()
-            os.environ["SP_USERNAME"] = user_var.get().strip()
-            os.environ["SP_PASSWORD"] = pwd_var.get().strip()
-            global START_URL
-            START_URL = url_var.get().strip() or START_URL
+            profile = {
+                "name": selected_name.get(),
+                "url": url_var.get().strip() or START_URL,
+                "username": user_var.get().strip(),
+                "password": pwd_var.get().strip(),
+                "allow": next((p.get("allow", "") for p in PROFILES_STATE["profiles"] if p["name"] == selected_name.get()), ""),
+            }
             status_var.set("Запущено… окно можно оставить открытым и менять скорость")
             start_btn.config(state="disabled")
             stop_btn.config(state="normal", text="Пауза")
-            os.environ[FORCE_LOGIN_ENV] = "1" if (os.environ.get("SP_USERNAME") or os.environ.get("SP_PASSWORD")) else "0"
-            Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+            runtime_start([profile])
+
+        def on_start_all():
+            fleet = [dict(p) for p in PROFILES_STATE["profiles"] if p.get("url")]
+            if not fleet:
+                status_var.set("Нет профилей со ссылкой для запуска")
+                return
+            try:
+                SPEED_STATE["value"] = float(speed_var.get() or 1.0)
+            except Exception:
+                SPEED_STATE["value"] = 1.0
+            set_paused(False)
+            PROFILE_STATS.clear()
+            for prof in fleet:
+                profile_stats(prof["name"])
+            start_btn.config(state="disabled")
+            start_all_btn.config(state="disabled")
+            stop_btn.config(state="normal", text="Пауза")
+            runtime_start(fleet, fleet=True)
 
         def on_stop():
-            if STOP_FLAG["stop"]:
-                STOP_FLAG["stop"] = False
-                status_var.set("Продолжаю…")
-                stop_btn.config(text="Пауза")
-            else:
-                STOP_FLAG["stop"] = True
-                status_var.set("Пауза")
-                stop_btn.config(text="Продолжить")
+            runtime_pause(not STOP_FLAG["stop"])
 
         start_btn.configure(command=on_start)
+        start_all_btn.configure(command=on_start_all)
         stop_btn.configure(command=on_stop)
 
         refresh_profile_listbox()
         if selected_name.get():
             load_profile_into_fields(selected_name.get())
 
-        def poll():
+        def apply_run_state():
             if BOT_STATE["running"]:
-                status_var.set("Работает… можно менять скорость или нажать Пауза")
-                stop_btn.config(state="normal")
-                start_btn.config(state="disabled")
+                paused = STOP_FLAG["stop"]
+                status_var.set("Пауза" if paused else "Работает… можно менять скорость или нажать Пауза")
+                stop_btn.config(state="normal", text="Продолжить" if paused else "Пауза")
+                start_btn.config(state="normal" if selected_name.get() != ACTIVE_PROFILE_NAME["name"] else "disabled")
+                start_all_btn.config(state="disabled")
             else:
-                if STOP_FLAG["stop"]:
-                    status_var.set("Остановлено")
-                else:
-                    status_var.set("Готов к запуску")
+                status_var.set("Остановлено" if STOP_FLAG["stop"] else "Готов к запуску")
                 start_btn.config(state="normal")
-                stop_btn.config(state="disabled")
+                start_all_btn.config(state="normal")
+                stop_btn.config(state="disabled", text="Пауза")
+
+        def refresh_fleet_text():
+            fleet_var.set("\n".join(
+                f"{name}: {st['status']} · {st['processed']} шт. · {stats_rate_per_hour(st)}/час"
+                for name, st in PROFILE_STATS.items()
+            ) + (f"\nАвто: {pace_summary()}" if PACE_STATE["enabled"] else ""))
+
+        def pump():
             try:
-                name = selected_name.get()
-                for p in PROFILES_STATE["profiles"]:
-                    if p["name"] == name:
-                        p["url"] = url_var.get().strip()
-                        p["username"] = user_var.get().strip()
-                        p["password"] = pwd_var.get().strip()
-                        break
-                save_profiles(PROFILES_STATE["profiles"])
+                changes = drain_bus()
+                if "running" in changes or "paused" in changes:
+                    apply_run_state()
+                if "pace" in changes and PACE_STATE["enabled"]:
+                    speed_var.set(SPEED_STATE["value"])
+                    speed_value_lbl.configure(text=f"{SPEED_STATE['value']:.1f}")
+                if "pace" in changes or any(topic.startswith("stats:") for topic in changes):
+                    refresh_fleet_text()
+                lines = drain_log_lines()
+                if lines:
+                    append_log_lines(lines)
             except Exception:
                 pass
-            root.after(400, poll)
+            root.after(UI_PUMP_MS, pump)
 
-        poll()
+        selected_name.trace_add("write", lambda *_a: apply_run_state() if BOT_STATE["running"] else None)
+        apply_run_state()
+        pump()
+        startup_mark("panel")
+        root.after_idle(log_startup_report)
         root.mainloop()
+        flush_profiles_save()
+        runtime_shutdown()
     except Exception:
         asyncio.run(main())
 
@@ -1639,4 +4152,6 @@ def run() -> None:
     """Точка входа пакета."""
     run_control_panel_main_thread()
 
+startup_mark("auto_bot.app")
+
 
@@ -0,0 +1,169 @@
+"""Замер пропускной способности на локальной имитации CMS: python -m auto_bot.bench --cards 60 --workers 2
+
+Поднимает auto_bot.mock_cms, запускает бота без окна на один проход по папке и печатает JSON‑отчёт:
+карточек/час (от запуска до конца и в установившемся режиме), сколько трансляций сервер реально сохранил
+и перцентили фаз обработки. Отчёт пишется в var/bench/; --baseline сравнивает с прошлым отчётом.
+Код выхода: 0 — сохранены все карточки, 1 — не все, 3 — падение скорости больше --max-regression.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from . import app, mock_cms
+
+BENCH_PROFILE = "bench"
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m auto_bot.bench", description="Бенчмарк Auto Bot на имитации CMS")
+    mock_cms.add_config_arguments(parser)
+    parser.add_argument("--speed", type=float, default=1.0, help="множитель скорости (0.2–3.0)")
+    parser.add_argument("--workers", type=int, default=1, help="число параллельных вкладок")
+    parser.add_argument("--auto-speed", action="store_true", help="включить авто‑темп")
+    parser.add_argument("--save-mode", choices=("ui", "api"), default="ui", help="режим сохранения")
+    parser.add_argument("--open-mode", choices=("auto", "click"), default="auto", help="открытие карточек: напрямую с каскадом кликов в запасе или только кликами")
+    parser.add_argument("--pipeline-depth", type=int, choices=(1, 2), default=app.PIPELINE_DEPTH, help="карточек в работе на вкладке: 1 — строго по очереди, 2 — следующая по ответу сервера")
+    parser.add_argument("--card-route", action="store_true", help="открывать карточки маршрутом имитации (CARD_ROUTE_TEMPLATE)")
+    parser.add_argument("--out", help="куда записать отчёт (по умолчанию var/bench/<время>.json)")
+    parser.add_argument("--baseline", help="прошлый отчёт для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.0, help="допустимое падение скорости к baseline, %% (0 — не проверять)")
+    parser.add_argument("--headful", action="store_true", help="показывать окно браузера")
+    return parser.parse_args(argv)
+
+
+def isolate_state(workdir: str, save_mode: str, session_check_url: str, open_mode: str, card_route: str) -> None:
+    """Сессии, журнал, рейтинг и метрики прогона — во временном каталоге, чтобы прогоны были сравнимы."""
+    app.STATE_PATH = os.path.join(workdir, "state.json")
+    app.RANKING_PATH = os.path.join(workdir, "ranking.json")
+    app.API_CAPTURE_PATH = os.path.join(workdir, "api_capture.json")
+    app.LEDGER_PATH = os.path.join(workdir, "ledger.sqlite3")
+    app.METRICS_EVENTS_PATH = os.path.join(workdir, "metrics.jsonl")
+    app.METRICS_PROM_PATH = os.path.join(workdir, "metrics.prom")
+    app.LEDGER_FRESH_MINUTES = 0
+    app.SAVE_MODE = save_mode
+    app.SHOW_CLICKS = False
+    app.SESSION_CHECK_URL = session_check_url
+    app.OPEN_MODE = open_mode
+    app.CARD_ROUTE_TEMPLATE = card_route
+
+
+def phase_report() -> dict:
+    return {
+        phase: {**{k: round(v, 1) for k, v in app.phase_percentiles(h).items()}, "count": h["count"], "fails": h["fails"]}
+        for phase, h in sorted(app.PHASE_METRICS.get(BENCH_PROFILE, {}).items())
+    }
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Изменение ключевых показателей относительно baseline, в процентах."""
+    def change(current: float, before: float) -> float | None:
+        return round((current - before) * 100 / before, 1) if before else None
+
+    result = {}
+    for key in ("cards_per_hour", "steady_cards_per_hour"):
+        result[key] = {"baseline": baseline.get(key, 0), "current": report[key], "change_pct": change(report[key], baseline.get(key, 0))}
+    for phase, current in report["phases_ms"].items():
+        before = baseline.get("phases_ms", {}).get(phase)
+        if before:
+            result[f"{phase}.p50"] = {"baseline": before["p50"], "current": current["p50"], "change_pct": change(current["p50"], before["p50"])}
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.workers < 1 or not (0.2 <= args.speed <= 3.0) or args.cards < 1:
+        print("Неверные значения --workers/--speed/--cards", file=sys.stderr)
+        return 2
+    # Леджер, рейтинг и метрики прогона живут во временном каталоге и удаляются вместе с ним
+    with tempfile.TemporaryDirectory(prefix="auto_bot_bench_") as workdir:
+        return run_bench(args, workdir)
+
+
+def run_bench(args: argparse.Namespace, workdir: str) -> int:
+    """Прогон против mock‑CMS с состоянием в workdir; отчёт пишется в var/bench (или --out)."""
+    var_dir = os.path.dirname(app.STATE_PATH) or "."
+    config = mock_cms.config_from_args(args)
+    server = mock_cms.start_server(config)
+    host, port = server.server_address[:2]
+    isolate_state(
+        workdir, args.save_mode, f"http://{host}:{port}/api/me",
+        args.open_mode, mock_cms.CARD_ROUTE if args.card_route else "",
+    )
+
+    app.LOG_STREAM["stream"] = sys.stderr
+    app.SPEED_STATE["value"] = args.speed
+    app.WORKERS_STATE["value"] = min(args.workers, app.WORKERS_MAX)
+    app.MAX_PASSES_STATE["value"] = 1
+    app.MAX_WAIT_SECONDS = 60
+    app.PACE_STATE["enabled"] = args.auto_speed
+    app.PIPELINE_DEPTH = args.pipeline_depth
+    app.pace_reset(app.WORKERS_STATE["value"])
+    app.ACTIVE_PROFILE_NAME["name"] = BENCH_PROFILE
+    profile = {
+        "name": BENCH_PROFILE,
+        "url": mock_cms.server_url(server),
+        "username": server.state["config"]["username"],
+        "password": server.state["config"]["password"],
+    }
+
+    started = time.time()
+    try:
+        asyncio.run(app.main(profile, headless=not args.headful))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    duration = max(0.001, time.time() - started)
+
+    saved_at = sorted(server.state["saved"].values())
+    steady = (len(saved_at) - 1) * 3600 / (saved_at[-1] - saved_at[0]) if len(saved_at) > 1 and saved_at[-1] > saved_at[0] else 0
+    stats = app.PROFILE_STATS.get(BENCH_PROFILE, {})
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "config": {
+            **config, "speed": args.speed, "workers": args.workers, "auto_speed": args.auto_speed,
+            "save_mode": args.save_mode, "open_mode": args.open_mode, "card_route": args.card_route,
+            "pipeline_depth": args.pipeline_depth,
+        },
+        "ok": len(saved_at) == args.cards,
+        "duration_s": round(duration, 1),
+        "cards_total": args.cards,
+        "saved_unique": len(saved_at),
+        "save_requests": server.state["saves"],
+        "processed": stats.get("processed", 0),
+        "errors": stats.get("errors", 0),
+        "cards_per_hour": int(len(saved_at) * 3600 / duration),
+        "steady_cards_per_hour": int(steady),
+        "final_speed": app.SPEED_STATE["value"],
+        "phases_ms": phase_report(),
+        "open_paths": app.open_path_summary(BENCH_PROFILE),
+    }
+    exit_code = 0 if report["ok"] else 1
+    if args.baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                report["vs_baseline"] = compare(report, json.load(f))
+        except Exception as e:
+            print(f"Не удалось прочитать baseline: {e}", file=sys.stderr)
+        drop = (report.get("vs_baseline", {}).get("steady_cards_per_hour") or {}).get("change_pct")
+        if args.max_regression and drop is not None and drop < -args.max_regression:
+            exit_code = 3
+
+    out = args.out or os.path.join(var_dir, "bench", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    try:
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Отчёт: {out}", file=sys.stderr)
+    except Exception as e:
+        print(f"Не удалось записать отчёт: {e}", file=sys.stderr)
+    print(json.dumps(report, ensure_ascii=False))
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,409 @@
+"""Локальная имитация SmartPlayer CMS для замеров и отладки без боевого сервера.
+
+python -m auto_bot.mock_cms --port 8765 --cards 120 --latency-ms 80
+
+Повторяет то, на что опирается бот: плитки broadcast_broadcast_* с иконкой звука, карточку с кнопкой‑дискетой,
+диалог «Вы действительно хотите сохранить изменения», тост «Сохранено», подгрузку плиток при прокрутке,
+форму входа и JSON‑API (/api/broadcasts, /api/broadcasts/<id>) с настраиваемой задержкой.
+Карточка открывается и маршрутом #/broadcasts/<id>?folderId=<папка> (CARD_ROUTE для CARD_ROUTE_TEMPLATE бота).
+"""
+import argparse
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SESSION_COOKIE = "sp_session"
+DEFAULT_FOLDER = "602"
+
+DEFAULT_CONFIG = {
+    "cards": 60,            # трансляций в папке
+    "page_size": 24,        # плиток за одну подгрузку
+    "latency_ms": 50,       # задержка каждого ответа API
+    "save_latency_ms": 150, # дополнительная задержка сохранения
+    "open_delay_ms": 150,   # через сколько после двойного клика появляется карточка
+    "close_delay_ms": 300,  # через сколько после сохранения карточка закрывается сама
+    "fail_rate": 0.0,       # доля сохранений, отвечающих HTTP 500
+    "username": "bench@example.com",
+    "password": "bench",
+}
+
+# Маршрут карточки имитации в формате CARD_ROUTE_TEMPLATE бота
+CARD_ROUTE = "#/broadcasts/{id}?folderId={folder}"
+
+# Иконка звука с плитки SmartPlayer (упрощённая)
+VOLUME_ICON = (
+    '<span data-original-title="Выключить звук"><svg class="volume_mute_icon" width="18" height="18" viewBox="0 0 18 18">'
+    '<path d="M2 6h4l5-4v14l-5-4H2z"/></svg></span>'
+)
+# 1×1 прозрачный PNG для превью плиток
+THUMB_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000b49444154789c6360000200000500017a5eab3f0000000049454e44ae426082"
+)
+
+INDEX_HTML = """<!doctype html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>SmartPlayer (mock)</title>
+<style>
+  body { margin: 0; font: 14px sans-serif; }
+  header { height: 48px; display: flex; align-items: center; justify-content: space-between; padding: 0 16px; background: #263238; color: #fff; }
+  .grid-scroll { height: calc(100vh - 48px); overflow-y: auto; }
+  .grid { display: flex; flex-wrap: wrap; gap: 12px; padding: 12px; }
+  .tile { width: 220px; height: 170px; border: 1px solid #ccc; border-radius: 6px; position: relative; }
+  .fq9hcom { height: 110px; background: #eceff1; }
+  .fq9hcom img { width: 100%; height: 100%; }
+  .f1t4bdx7 { padding: 6px 8px; }
+  .tile span[data-original-title] { position: absolute; right: 8px; bottom: 8px; }
+  .overlay { position: fixed; inset: 0; background: rgba(0,0,0,.35); display: flex; align-items: center; justify-content: center; }
+  .card, .confirm { background: #fff; padding: 24px; border-radius: 8px; min-width: 320px; }
+  .toast { position: fixed; right: 16px; bottom: 16px; background: #2e7d32; color: #fff; padding: 10px 16px; border-radius: 6px; }
+  .toast.error { background: #c62828; }
+  form { width: 320px; margin: 120px auto; display: flex; flex-direction: column; gap: 10px; }
+</style>
+</head>
+<body>
+<div id="app"></div>
+<script>
+const CFG = __CONFIG__;
+const app = document.getElementById('app');
+const el = (html) => { const t = document.createElement('template'); t.innerHTML = html.trim(); return t.content.firstChild; };
+const api = (url, opts) => fetch(url, opts);
+
+function toast(text, error) {
+  const node = el(`<div class="toast${error ? ' error' : ''}">${text}</div>`);
+  document.body.appendChild(node);
+  setTimeout(() => node.remove(), 1500);
+}
+
+let currentFolder = null;
+
+function route() {
+  const hash = location.hash || '#/';
+  if (hash.startsWith('#/login')) { currentFolder = null; renderLogin(); return; }
+  api('/api/me').then((r) => {
+    if (r.status === 401) { location.hash = '#/login'; return; }
+    const m = hash.match(/folderId=([^&]+)/);
+    const folder = m ? m[1] : CFG.folder;
+    // Маршрут карточки #/broadcasts/<id>?folderId=…: сетка остаётся под карточкой
+    const card = hash.match(/^#[/]broadcasts[/]([^?/]+)/);
+    if (currentFolder !== folder) renderGrid(folder);
+    if (card) openCard(card[1], folder);
+  });
+}
+
+function renderLogin() {
+  app.innerHTML = '';
+  const form = el(`<form>
+    <h2>Вход</h2>
+    <input type="email" name="email" placeholder="Email">
+    <input type="password" name="password" placeholder="Пароль">
+    <button type="submit">Войти</button>
+    <div class="error"></div>
+  </form>`);
+  form.addEventListener('submit', (e) => {
+    e.preventDefault();
+    const body = JSON.stringify({email: form.email.value, password: form.password.value});
+    api('/api/login', {method: 'POST', headers: {'Content-Type': 'application/json'}, body}).then((r) => {
+      if (r.ok) { location.hash = '#/broadcasts?folderId=' + CFG.folder; }
+      else { form.querySelector('.error').textContent = 'Неверный логин или пароль'; }
+    });
+  });
+  app.appendChild(form);
+}
+
+function renderGrid(folder) {
+  currentFolder = folder;
+  app.innerHTML = '';
+  const header = el('<header><b>Трансляции</b><button class="logout">Выйти</button></header>');
+  header.querySelector('.logout').addEventListener('click', () => {
+    api('/api/logout', {method: 'POST'}).then(() => { location.hash = '#/login'; });
+  });
+  const scroller = el('<div class="grid-scroll"><div class="grid"></div></div>');
+  const grid = scroller.firstChild;
+  app.append(header, scroller);
+  let offset = 0, loading = false, done = false;
+  const loadMore = () => {
+    if (loading || done) return;
+    loading = true;
+    api(`/api/broadcasts?folderId=${folder}&offset=${offset}&limit=${CFG.page_size}`).then((r) => r.json()).then((data) => {
+      for (const item of data.items) {
+        const tile = el(`<div id="broadcast_broadcast_${item.id}" class="tile">
+          <div class="fq9hcom"><img src="/thumb/${item.id}.png"></div>
+          <div class="f1wpuvpe"><div class="f1t4bdx7">${item.name}</div></div>
+          ${CFG.icon}
+        </div>`);
+        tile.addEventListener('dblclick', () => openCard(item.id));
+        grid.appendChild(tile);
+      }
+      offset += data.items.length;
+      done = offset >= data.total;
+      loading = false;
+      if (!done && scroller.scrollHeight <= scroller.clientHeight) loadMore();
+    });
+  };
+  scroller.addEventListener('scroll', () => {
+    if (scroller.scrollTop + scroller.clientHeight > scroller.scrollHeight - 200) loadMore();
+  });
+  loadMore();
+}
+
+function closeCard(overlay, folder) {
+  overlay.remove();
+  // Закрытие карточки, открытой по маршруту, возвращает маршрут сетки без перерисовки
+  if (/^#[/]broadcasts[/][^?/]+/.test(location.hash)) history.replaceState(null, '', '#/broadcasts?folderId=' + folder);
+}
+
+function openCard(id, folder) {
+  folder = folder || currentFolder;
+  if (document.querySelector('.overlay')) return;
+  setTimeout(() => api(`/api/broadcasts/${id}`).then((r) => r.json()).then((state) => {
+    const overlay = el(`<div class="overlay"><div class="card">
+      <h3>${state.name}</h3>
+      <p>Громкость: ${state.volume}</p>
+      <button class="save" data-original-title="Сохранить"><svg class="diskette_icon" width="18" height="18" viewBox="0 0 18 18"><path d="${CFG.save_path}"/></svg></button>
+      <button class="close">Закрыть</button>
+    </div></div>`);
+    overlay.querySelector('.close').addEventListener('click', () => closeCard(overlay, folder));
+    overlay.querySelector('.save').addEventListener('click', () => confirmSave(overlay, state, folder));
+    document.body.appendChild(overlay);
+  }), CFG.open_delay_ms);
+}
+
+function confirmSave(overlay, state, folder) {
+  const dialog = el(`<div class="overlay"><div class="confirm">
+    <p>Вы действительно хотите сохранить изменения?</p>
+    <button class="yes">Да</button> <button class="no">Нет</button>
+  </div></div>`);
+  dialog.querySelector('.no').addEventListener('click', () => dialog.remove());
+  dialog.querySelector('.yes').addEventListener('click', () => {
+    dialog.remove();
+    const body = JSON.stringify({name: state.name, volume: state.volume, muted: state.muted});
+    api(`/api/broadcasts/${state.id}`, {method: 'PUT', headers: {'Content-Type': 'application/json'}, body}).then((r) => {
+      if (!r.ok) { toast('Ошибка сохранения', true); return; }
+      toast('Сохранено');
+      setTimeout(() => closeCard(overlay, folder), CFG.close_delay_ms);
+    });
+  });
+  document.body.appendChild(dialog);
+}
+
+window.addEventListener('hashchange', route);
+route();
+</script>
+</body>
+</html>
+"""
+
+
+def build_state(config: dict) -> dict:
+    """Состояние сервера: трансляции, сессии и счётчики сохранений."""
+    broadcasts = {
+        str(1000 + n): {"id": str(1000 + n), "name": f"Трансляция {n + 1}", "volume": 50, "muted": False, "folderId": DEFAULT_FOLDER}
+        for n in range(config["cards"])
+    }
+    return {"config": config, "broadcasts": broadcasts, "sessions": set(), "saves": 0, "saved": {}, "lock": threading.Lock()}
+
+
+def render_index(config: dict) -> bytes:
+    from .app import SAVE_PATH_D
+
+    client = {
+        "folder": DEFAULT_FOLDER,
+        "page_size": config["page_size"],
+        "open_delay_ms": config["open_delay_ms"],
+        "close_delay_ms": config["close_delay_ms"],
+        "save_path": SAVE_PATH_D,
+        "icon": VOLUME_ICON,
+    }
+    return INDEX_HTML.replace("__CONFIG__", json.dumps(client, ensure_ascii=False)).encode("utf-8")
+
+
+class MockCmsHandler(BaseHTTPRequestHandler):
+    server_version = "SmartPlayerMock/1.0"
+
+    @property
+    def state(self) -> dict:
+        return self.server.state  # type: ignore[attr-defined]
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def send_json(self, status: int, payload, headers: dict | None = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except Exception:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def authorized(self) -> bool:
+        cookie = SimpleCookie(self.headers.get("Cookie") or "")
+        morsel = cookie.get(SESSION_COOKIE)
+        return bool(morsel) and morsel.value in self.state["sessions"]
+
+    def api_delay(self, extra_ms: int = 0) -> None:
+        delay_ms = self.state["config"]["latency_ms"] + extra_ms
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def do_GET(self) -> None:
+        parts = urlsplit(self.path)
+        path = parts.path
+        if path in ("/", "/index.html"):
+            body = render_index(self.state["config"])
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if path.startswith("/thumb/"):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(THUMB_PNG)))
+            self.end_headers()
+            self.wfile.write(THUMB_PNG)
+            return
+        if not path.startswith("/api/"):
+            self.send_json(404, {"error": "not found"})
+            return
+        self.api_delay()
+        if not self.authorized():
+            self.send_json(401, {"error": "unauthorized"})
+            return
+        if path == "/api/me":
+            self.send_json(200, {"email": self.state["config"]["username"]})
+            return
+        if path == "/api/broadcasts":
+            query = parse_qs(parts.query)
+            folder = (query.get("folderId") or [DEFAULT_FOLDER])[0]
+            offset = int((query.get("offset") or ["0"])[0])
+            limit = int((query.get("limit") or [str(self.state["config"]["page_size"])])[0])
+            items = [b for b in self.state["broadcasts"].values() if b["folderId"] == folder]
+            self.send_json(200, {"total": len(items), "items": items[offset:offset + limit]})
+            return
+        match = re.fullmatch(r"/api/broadcasts/([^/]+)", path)
+        if match and match.group(1) in self.state["broadcasts"]:
+            self.send_json(200, self.state["broadcasts"][match.group(1)])
+            return
+        self.send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        path = urlsplit(self.path).path
+        self.api_delay()
+        if path == "/api/login":
+            data = self.read_json()
+            config = self.state["config"]
+            if data.get("email") != config["username"] or data.get("password") != config["password"]:
+                self.send_json(401, {"error": "invalid credentials"})
+                return
+            token = secrets.token_hex(16)
+            self.state["sessions"].add(token)
+            cookie = f"{SESSION_COOKIE}={token}; Path=/; HttpOnly; Max-Age=86400"
+            self.send_json(200, {"ok": True}, {"Set-Cookie": cookie})
+            return
+        if path == "/api/logout":
+            cookie = SimpleCookie(self.headers.get("Cookie") or "")
+            morsel = cookie.get(SESSION_COOKIE)
+            if morsel:
+                self.state["sessions"].discard(morsel.value)
+            self.send_json(200, {"ok": True}, {"Set-Cookie": f"{SESSION_COOKIE}=; Path=/; Max-Age=0"})
+            return
+        self.send_json(404, {"error": "not found"})
+
+    def do_PUT(self) -> None:
+        path = urlsplit(self.path).path
+        config = self.state["config"]
+        self.api_delay(config["save_latency_ms"])
+        if not self.authorized():
+            self.send_json(401, {"error": "unauthorized"})
+            return
+        match = re.fullmatch(r"/api/broadcasts/([^/]+)", path)
+        if not match or match.group(1) not in self.state["broadcasts"]:
+            self.send_json(404, {"error": "not found"})
+            return
+        if config["fail_rate"] and random.random() < config["fail_rate"]:
+            self.send_json(500, {"error": "internal error"})
+            return
+        data = self.read_json()
+        with self.state["lock"]:
+            item = self.state["broadcasts"][match.group(1)]
+            item.update({k: v for k, v in data.items() if k in ("name", "volume", "muted")})
+            self.state["saves"] += 1
+            self.state["saved"][item["id"]] = time.time()
+        self.send_json(200, item)
+
+
+def start_server(config: dict | None = None, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Запускает сервер в фоновом потоке; port=0 — любой свободный. Остановка — server.shutdown()."""
+    server = ThreadingHTTPServer((host, port), MockCmsHandler)
+    server.daemon_threads = True
+    server.state = build_state({**DEFAULT_CONFIG, **(config or {})})  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, name="mock-cms", daemon=True).start()
+    return server
+
+
+def server_url(server: ThreadingHTTPServer, folder: str = DEFAULT_FOLDER) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/#/broadcasts?folderId={folder}"
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """Общие флаги имитации (используются и бенчмарком)."""
+    parser.add_argument("--cards", type=int, default=DEFAULT_CONFIG["cards"], help="сколько трансляций в папке")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_CONFIG["page_size"], help="плиток за одну подгрузку")
+    parser.add_argument("--latency-ms", type=int, default=DEFAULT_CONFIG["latency_ms"], help="задержка ответов API")
+    parser.add_argument("--save-latency-ms", type=int, default=DEFAULT_CONFIG["save_latency_ms"], help="доп. задержка сохранения")
+    parser.add_argument("--open-delay-ms", type=int, default=DEFAULT_CONFIG["open_delay_ms"], help="задержка появления карточки")
+    parser.add_argument("--close-delay-ms", type=int, default=DEFAULT_CONFIG["close_delay_ms"], help="задержка автозакрытия карточки")
+    parser.add_argument("--fail-rate", type=float, default=DEFAULT_CONFIG["fail_rate"], help="доля сохранений с HTTP 500")
+
+
+def config_from_args(args: argparse.Namespace) -> dict:
+    return {
+        "cards": args.cards,
+        "page_size": args.page_size,
+        "latency_ms": args.latency_ms,
+        "save_latency_ms": args.save_latency_ms,
+        "open_delay_ms": args.open_delay_ms,
+        "close_delay_ms": args.close_delay_ms,
+        "fail_rate": args.fail_rate,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m auto_bot.mock_cms", description="Имитация SmartPlayer CMS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    server = start_server(config_from_args(args), args.host, args.port)
+    config = server.state["config"]  # type: ignore[attr-defined]
+    print(f"Имитация CMS: {server_url(server)}  (логин {config['username']} / {config['password']})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()